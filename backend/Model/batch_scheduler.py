@@ -0,0 +1,235 @@
+import threading
+import time
+import queue
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeoutError
+
+import torch
+
+
+# --- MICRO-BATCHING INFERENCE SCHEDULER ---
+class _PendingRequest:
+    __slots__ = ('tensor', 'future', 'enqueued_at', 'deadline')
+
+    def __init__(self, tensor, deadline=None):
+        self.tensor = tensor
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.deadline = deadline
+
+
+def _settle(future, result=None, error=None):
+    # The caller may cancel between our check and the set; that is not an error
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class InferenceScheduler:
+    """
+    Collects concurrent single-image requests into one batched forward pass.
+
+    Callers hand in a preprocessed CHW tensor and block until the softmax
+    vector for that image comes back. A background thread drains the queue,
+    waiting at most `max_wait_ms` for up to `max_batch_size` requests before
+    running the model once on the stacked batch. `observer`, if given, is
+    called as observer(batch_size, queue_waits, forward_seconds) per batch.
+
+    Requests whose caller gave up (cancelled future) or whose deadline (a
+    time.monotonic() value) passed while queued are dropped before batching.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=10, observer=None):
+        self.model = model
+        self.observer = observer
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._batch_buffer = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+        self._worker.start()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._requests = 0
+        self._max_batch_seen = 0
+        self._dropped = 0
+        self._batch_histogram = {}
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+        self._total_forward_time = 0.0
+
+    def submit(self, tensor, deadline=None):
+        """Queues one image tensor and returns a Future resolving to its probabilities."""
+        if not self._running:
+            raise RuntimeError("Inference scheduler has been shut down")
+        pending = _PendingRequest(tensor, deadline)
+        self._queue.put(pending)
+        return pending.future
+
+    def predict(self, tensor, timeout=None, deadline=None):
+        """
+        Blocking helper: submit a tensor and wait for its probabilities. On a
+        timeout the request is cancelled, so the caller may reuse the tensor's
+        memory and the scheduler skips the request if it has not started.
+        """
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        future = self.submit(tensor, deadline)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def _is_live(self, item):
+        if item.future.cancelled():
+            self._count_dropped()
+            return False
+        if item.deadline is not None and time.monotonic() >= item.deadline:
+            _settle(item.future, error=FutureTimeoutError('Deadline passed before inference'))
+            self._count_dropped()
+            return False
+        return True
+
+    def _count_dropped(self):
+        with self._stats_lock:
+            self._dropped += 1
+
+    def _collect_batch(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return None
+            if self._is_live(first):
+                break
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Put the sentinel back so the loop exits after this batch
+                self._queue.put(None)
+                break
+            if self._is_live(item):
+                batch.append(item)
+        return batch
+
+    def _run(self):
+        # Backends that expose submit_batch (e.g. the worker pool) run batches
+        # asynchronously, so the next batch can be formed while one is in flight
+        dispatch_async = hasattr(self.model, 'submit_batch')
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            started = time.perf_counter()
+            try:
+                if dispatch_async:
+                    # The batch leaves this thread, so it gets its own storage
+                    inputs = torch.stack([item.tensor for item in batch])
+                    pending = self.model.submit_batch(inputs)
+                    pending.add_done_callback(
+                        lambda f, batch=batch, started=started: self._complete(batch, started, f)
+                    )
+                    continue
+                inputs = self._fill_batch_buffer(batch)
+                with torch.no_grad():
+                    outputs = self.model(inputs)
+            except Exception as e:
+                for item in batch:
+                    _settle(item.future, error=e)
+                continue
+            self._fan_out(batch, started, outputs)
+
+    def _fill_batch_buffer(self, batch):
+        """Copies the batch into a reused channels-last buffer instead of allocating one."""
+        shape = batch[0].tensor.shape
+        if self._batch_buffer is None or self._batch_buffer.shape[1:] != shape:
+            self._batch_buffer = torch.empty(
+                (self.max_batch_size, *shape), memory_format=torch.channels_last
+            )
+        inputs = self._batch_buffer[:len(batch)]
+        for i, item in enumerate(batch):
+            inputs[i].copy_(item.tensor)
+        return inputs
+
+    def _complete(self, batch, started, pending):
+        error = pending.exception()
+        if error is not None:
+            for item in batch:
+                _settle(item.future, error=error)
+            return
+        self._fan_out(batch, started, pending.result())
+
+    def _fan_out(self, batch, started, outputs):
+        probabilities = torch.nn.functional.softmax(outputs, dim=1)
+        finished = time.perf_counter()
+
+        for i, item in enumerate(batch):
+            _settle(item.future, probabilities[i])
+
+        waits = [started - item.enqueued_at for item in batch]
+        with self._stats_lock:
+            size = len(batch)
+            self._batches += 1
+            self._requests += size
+            self._max_batch_seen = max(self._max_batch_seen, size)
+            self._batch_histogram[size] = self._batch_histogram.get(size, 0) + 1
+            self._total_queue_wait += sum(waits)
+            self._max_queue_wait = max(self._max_queue_wait, max(waits))
+            self._total_forward_time += finished - started
+        if self.observer is not None:
+            try:
+                self.observer(len(batch), waits, finished - started)
+            except Exception:
+                pass
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """Returns batch-size and queue-wait statistics for tuning."""
+        with self._stats_lock:
+            batches = self._batches or 1
+            requests = self._requests or 1
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self.queue_depth(),
+                'batches': self._batches,
+                'requests': self._requests,
+                'avg_batch_size': self._requests / batches if self._batches else 0.0,
+                'max_batch_seen': self._max_batch_seen,
+                'dropped_requests': self._dropped,
+                'batch_size_histogram': {str(k): v for k, v in sorted(self._batch_histogram.items())},
+                'avg_queue_wait_ms': (self._total_queue_wait / requests) * 1000.0 if self._requests else 0.0,
+                'max_queue_wait_ms': self._max_queue_wait * 1000.0,
+                'avg_forward_ms': (self._total_forward_time / batches) * 1000.0 if self._batches else 0.0,
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._reset_stats()
+
+    def shutdown(self, wait=True):
+        """Stops the worker thread after the queued requests are served."""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        if wait:
+            self._worker.join()
@@ -0,0 +1,257 @@
+"""
+Micro-benchmarks for the prediction path, broken down by stage.
+
+Each stage of predict_image is timed on its own: JPEG decode and transform
+per image size, then forward pass, softmax and label decoding per batch size.
+Inputs are synthetic, and a randomly initialised SkinClassifier stands in
+when the checkpoint is missing, so the suite runs offline. Results are
+written as JSON; pass --baseline to flag stages whose median got slower than
+a stored run by more than --tolerance.
+
+Usage (from the Model directory):
+    python benchmark_inference.py --output bench.json
+    python benchmark_inference.py --output bench.json --baseline bench_baseline.json
+    python benchmark_inference.py --output bench_baseline.json --sizes 640x480 4032x3024 --batch-sizes 1 8
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import cv2
+import joblib
+import numpy as np
+import torch
+
+from image_ingest import OFFLINE_LIMITS, inspect_image, reduced_decode_flag
+from standalone_predictor import (
+    SkinClassifier,
+    get_inference_transforms,
+    load_checkpoint,
+    build_model_from_checkpoint,
+)
+
+DEFAULT_SIZES = ('256x256', '640x480', '1920x1080', '4032x3024')
+DEFAULT_BATCH_SIZES = (1, 4, 8, 16)
+
+
+# --- SETUP ---
+class _StandInEncoder:
+    """Minimal label encoder used when the real .pkl is missing."""
+
+    def __init__(self, num_classes):
+        self.classes_ = np.array([f'class_{i}' for i in range(num_classes)])
+
+    def inverse_transform(self, indices):
+        return self.classes_[np.asarray(indices)]
+
+def load_encoder(encoder_path, num_classes):
+    if encoder_path and os.path.exists(encoder_path):
+        with open(encoder_path, 'rb') as f:
+            return joblib.load(f), 'file'
+    return _StandInEncoder(num_classes), 'synthetic'
+
+def load_model(model_path, num_classes):
+    if model_path and os.path.exists(model_path):
+        model = build_model_from_checkpoint(load_checkpoint(model_path), num_classes)
+        source = 'checkpoint'
+    else:
+        # Timings do not depend on the weights, only on the architecture
+        torch.manual_seed(0)
+        model = SkinClassifier(num_classes=num_classes, pretrained=False)
+        source = 'random'
+    return model.eval(), source
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def synthetic_jpeg(width, height, seed=0):
+    """Noise with a gradient, so the encoded size is closer to a real photo than a flat image."""
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 20, size=(height, width, 3)).astype(np.float32)
+    image = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError(f"Could not encode a {width}x{height} test image")
+    return encoded.tobytes()
+
+
+# --- TIMING ---
+def time_stage(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'median_ms': statistics.median(samples),
+        'mean_ms': statistics.fmean(samples),
+        'p95_ms': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'min_ms': samples[0],
+        'max_ms': samples[-1],
+    }
+
+def run_benchmarks(model, label_encoder, sizes, batch_sizes, iterations, warmup):
+    results = {}
+    transform = get_inference_transforms()
+
+    # Per-image stages depend on the source resolution
+    for width, height in sizes:
+        data = synthetic_jpeg(width, height)
+        buffer = np.frombuffer(data, dtype=np.uint8)
+
+        def decode():
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        def decode_reduced():
+            # Header check + scaled-DCT decode, as served by the app
+            flag = reduced_decode_flag(inspect_image(data, OFFLINE_LIMITS), 224)
+            image = cv2.imdecode(buffer, flag)
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        rgb = decode()
+        key = f'{width}x{height}'
+        results[f'decode/{key}'] = dict(time_stage(decode, iterations, warmup), bytes=len(data))
+        results[f'decode_reduced/{key}'] = time_stage(decode_reduced, iterations, warmup)
+        results[f'transform/{key}'] = time_stage(lambda: transform(image=rgb)['image'], iterations, warmup)
+        print(f"[LOG] {key}: decode {results[f'decode/{key}']['median_ms']:.2f} ms "
+              f"(reduced {results[f'decode_reduced/{key}']['median_ms']:.2f} ms), "
+              f"transform {results[f'transform/{key}']['median_ms']:.2f} ms")
+
+    # Per-batch stages only see 224x224 tensors
+    sample = transform(image=rgb)['image']
+    for batch_size in batch_sizes:
+        inputs = sample.unsqueeze(0).repeat(batch_size, 1, 1, 1)
+        with torch.no_grad():
+            logits = model(inputs)
+            probabilities = torch.softmax(logits, dim=1)
+
+        def forward():
+            with torch.no_grad():
+                return model(inputs)
+
+        def softmax():
+            return torch.softmax(logits, dim=1)
+
+        def label_decode():
+            # Same work as decode_prediction, once per image in the batch
+            confidences, indices = torch.max(probabilities, 1)
+            labels = label_encoder.inverse_transform(indices.tolist())
+            return [(label, c) for label, c in zip(labels, confidences.tolist())]
+
+        key = f'batch={batch_size}'
+        for stage, fn in (('forward', forward), ('softmax', softmax), ('label_decode', label_decode)):
+            stats = time_stage(fn, iterations, warmup)
+            stats['per_image_ms'] = stats['median_ms'] / batch_size
+            results[f'{stage}/{key}'] = stats
+        print(f"[LOG] {key}: forward {results[f'forward/{key}']['median_ms']:.2f} ms "
+              f"({results[f'forward/{key}']['per_image_ms']:.2f} ms/image)")
+    return results
+
+
+# --- BASELINE COMPARISON ---
+def compare_to_baseline(results, baseline, tolerance):
+    """Benchmarks whose median is slower than the baseline's by more than `tolerance`."""
+    regressions = []
+    for name, stats in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get('median_ms'):
+            continue
+        ratio = stats['median_ms'] / previous['median_ms']
+        if ratio > 1.0 + tolerance:
+            regressions.append({
+                'benchmark': name,
+                'baseline_ms': previous['median_ms'],
+                'current_ms': stats['median_ms'],
+                'slowdown': ratio,
+            })
+    return sorted(regressions, key=lambda r: -r['slowdown'])
+
+def environment_info(model_source, encoder_source):
+    return {
+        'timestamp': datetime.datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'torch': torch.__version__,
+        'opencv': cv2.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'model_source': model_source,
+        'encoder_source': encoder_source,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stage-level micro-benchmarks for the inference path.")
+    parser.add_argument('--model', default='skin_disease_efficientnet_model1.pth')
+    parser.add_argument('--encoder', default='label_encoder_mode1.pkl')
+    parser.add_argument('--num-classes', type=int, default=None,
+                        help='Class count when no encoder file is available (default 7)')
+    parser.add_argument('--sizes', nargs='+', default=list(DEFAULT_SIZES), help='Source image sizes, WIDTHxHEIGHT')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=None, help='Earlier results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown versus the baseline before a stage is flagged')
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    label_encoder, encoder_source = load_encoder(args.encoder, args.num_classes or 7)
+    num_classes = args.num_classes or len(label_encoder.classes_)
+    model, model_source = load_model(args.model, num_classes)
+    print(f"[INFO] Benchmarking with a {model_source} model ({num_classes} classes, "
+          f"{torch.get_num_threads()} threads).")
+
+    results = run_benchmarks(
+        model, label_encoder,
+        sizes=[parse_size(s) for s in args.sizes],
+        batch_sizes=args.batch_sizes,
+        iterations=args.iterations,
+        warmup=args.warmup,
+    )
+    report = {
+        'environment': environment_info(model_source, encoder_source),
+        'config': {'sizes': args.sizes, 'batch_sizes': args.batch_sizes, 'iterations': args.iterations},
+        'results': results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline.get('results', {}), args.tolerance)
+        report['baseline'] = {'path': args.baseline, 'tolerance': args.tolerance, 'regressions': regressions}
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[SUCCESS] Results written to {args.output}")
+
+    if regressions:
+        print(f"\n[ERROR] {len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}:")
+        for r in regressions:
+            print(f"  -> {r['benchmark']:<28} {r['baseline_ms']:8.2f} ms -> {r['current_ms']:8.2f} ms "
+                  f"({r['slowdown']:.2f}x)")
+        return 1
+    if args.baseline:
+        print("[SUCCESS] No regressions against the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Offline bulk scoring for archived images.
+
+Decoding and preprocessing run in a pool of worker processes that feed a
+batched forward pass in the main process. Results (predicted class,
+confidence and the full probability vector) are written incrementally to CSV
+or to a directory of Parquet part files, so an interrupted run can be resumed
+by re-running the same command.
+
+Usage (from the Model directory):
+    python bulk_score.py --input /data/archive --output scores.csv
+    python bulk_score.py --manifest images.csv --output scores_parquet --format parquet
+"""
+import argparse
+import csv
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+from standalone_predictor import load_model_and_encoder, preprocess_image, get_inference_transforms
+from image_ingest import OFFLINE_LIMITS
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+# --- INPUTS ---
+def list_directory(folder):
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+def read_manifest(manifest_path, column='path'):
+    """Image paths from a CSV manifest; relative paths resolve against the manifest's folder."""
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    paths = []
+    with open(manifest_path, newline='') as f:
+        reader = csv.DictReader(f)
+        if column not in (reader.fieldnames or []):
+            raise ValueError(f"Manifest {manifest_path} has no '{column}' column")
+        for row in reader:
+            path = (row[column] or '').strip()
+            if path:
+                paths.append(path if os.path.isabs(path) else os.path.join(base_dir, path))
+    return paths
+
+
+# --- WORKER PROCESSES ---
+_transform = None
+
+def _init_worker():
+    global _transform
+    # One intra-op thread per decoder process; the forward pass owns the cores
+    torch.set_num_threads(1)
+    _transform = get_inference_transforms()
+
+def _load(path):
+    try:
+        return path, preprocess_image(path, _transform, limits=OFFLINE_LIMITS).numpy(), None
+    except Exception as e:
+        return path, None, str(e) or e.__class__.__name__
+
+
+# --- OUTPUT WRITERS ---
+class CsvResultWriter:
+    def __init__(self, path, class_names):
+        self.path = path
+        self.fieldnames = ['path', 'predicted_class', 'confidence', 'error'] + [f'prob_{c}' for c in class_names]
+        self.done = self._read_done()
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+        if is_new:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def _read_done(self):
+        if not os.path.exists(self.path):
+            return set()
+        # Drop a half-written trailing row left behind by an interrupted run
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+        with open(self.path, newline='') as f:
+            return {row['path'] for row in csv.DictReader(f) if row.get('path')}
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter:
+    """Writes one Parquet part file per flushed batch into an output directory."""
+
+    def __init__(self, path, class_names):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa, self._pq = pa, pq
+        self.path = path
+        self.fieldnames = ['path', 'predicted_class', 'confidence', 'error'] + [f'prob_{c}' for c in class_names]
+        # Explicit types, so a part holding only error rows (all-null scores)
+        # has the same schema as the rest and the directory reads as one dataset
+        self.schema = pa.schema(
+            [('path', pa.string()), ('predicted_class', pa.string()),
+             ('confidence', pa.float64()), ('error', pa.string())]
+            + [(f'prob_{c}', pa.float64()) for c in class_names]
+        )
+        os.makedirs(path, exist_ok=True)
+        self._parts = sorted(glob.glob(os.path.join(path, 'part-*.parquet')))
+        self.done = set()
+        for part in self._parts:
+            self.done.update(pq.read_table(part, columns=['path']).column('path').to_pylist())
+
+    def write(self, rows):
+        if not rows:
+            return
+        columns = {name: [row.get(name) for row in rows] for name in self.fieldnames}
+        table = self._pa.table(columns, schema=self.schema)
+        part_path = os.path.join(self.path, f'part-{len(self._parts):06d}.parquet')
+        tmp_path = part_path + '.tmp'
+        self._pq.write_table(table, tmp_path)
+        os.replace(tmp_path, part_path)
+        self._parts.append(part_path)
+
+    def close(self):
+        pass
+
+
+# --- SCORING ---
+def score_batch(model, batch, class_names):
+    inputs = torch.from_numpy(np.stack([array for _, array in batch]))
+    with torch.no_grad():
+        probabilities = torch.softmax(model(inputs), dim=1).numpy()
+    rows = []
+    for (path, _), probs in zip(batch, probabilities):
+        idx = int(probs.argmax())
+        row = {
+            'path': path,
+            'predicted_class': class_names[idx],
+            'confidence': float(probs[idx]),
+            'error': None,
+        }
+        row.update({f'prob_{c}': float(p) for c, p in zip(class_names, probs)})
+        rows.append(row)
+    return rows
+
+def run(paths, model, class_names, writer, batch_size=32, workers=None, chunksize=4):
+    todo = [p for p in paths if p not in writer.done]
+    skipped = len(paths) - len(todo)
+    if skipped:
+        print(f"[INFO] Resuming: {skipped} images already scored, {len(todo)} remaining.")
+
+    scored = failed = 0
+    started = time.perf_counter()
+    batch, pending_rows = [], []
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+        for path, array, error in pool.imap(_load, todo, chunksize=chunksize):
+            if error is not None:
+                failed += 1
+                pending_rows.append({'path': path, 'predicted_class': None, 'confidence': None, 'error': error})
+            else:
+                batch.append((path, array))
+            if len(batch) >= batch_size:
+                pending_rows.extend(score_batch(model, batch, class_names))
+                scored += len(batch)
+                batch = []
+                writer.write(pending_rows)
+                pending_rows = []
+                elapsed = time.perf_counter() - started
+                print(f"[LOG] {scored + failed}/{len(todo)} images ({scored / elapsed:.1f} img/s)")
+        if batch:
+            pending_rows.extend(score_batch(model, batch, class_names))
+            scored += len(batch)
+        writer.write(pending_rows)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'scored': scored,
+        'failed': failed,
+        'skipped': skipped,
+        'elapsed_seconds': elapsed,
+        'images_per_second': scored / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score a directory or CSV manifest of images.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help='Directory of images (searched recursively)')
+    source.add_argument('--manifest', help="CSV manifest with a 'path' column")
+    parser.add_argument('--manifest-column', default='path')
+    parser.add_argument('--output', required=True, help='CSV file, or directory for --format parquet')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--model', default='skin_disease_efficientnet_model1.pth')
+    parser.add_argument('--encoder', default='label_encoder_mode1.pkl')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=None, help='Decoder processes (default: CPU count)')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op threads for the forward pass')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    paths = list_directory(args.input) if args.input else read_manifest(args.manifest, args.manifest_column)
+    if not paths:
+        print("[ERROR] No images found.")
+        return 2
+
+    model, label_encoder = load_model_and_encoder(args.model, args.encoder)
+    class_names = [str(c) for c in label_encoder.classes_]
+
+    writer_cls = ParquetResultWriter if args.format == 'parquet' else CsvResultWriter
+    writer = writer_cls(args.output, class_names)
+    try:
+        summary = run(paths, model, class_names, writer, batch_size=args.batch_size, workers=args.workers)
+    finally:
+        writer.close()
+
+    print("\n--- Bulk Scoring Summary ---")
+    print(f"  -> Scored:     {summary['scored']}")
+    print(f"  -> Failed:     {summary['failed']}")
+    print(f"  -> Skipped:    {summary['skipped']} (already in {args.output})")
+    print(f"  -> Elapsed:    {summary['elapsed_seconds']:.1f} s")
+    print(f"  -> Throughput: {summary['images_per_second']:.1f} images/s")
+    print("----------------------------\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
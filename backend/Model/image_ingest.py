@@ -0,0 +1,100 @@
+"""
+Header-first image ingest.
+
+inspect_image() reads only the image header (format and dimensions) and
+rejects oversized, unsupported or decompression-bomb uploads before any
+pixels are decoded. decode_for_model() then decodes JPEGs with libjpeg's
+scaled DCT (cv2.IMREAD_REDUCED_COLOR_2/4/8), picking the largest reduction
+that keeps both sides at or above the model's input size, so a 48 MP photo
+is decoded at roughly 1/8 scale instead of in full.
+
+Only Pillow is imported at module level, so the web app can validate
+uploads without pulling in OpenCV.
+"""
+import io
+import warnings
+from collections import namedtuple
+
+from PIL import Image
+
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 50_000_000
+DEFAULT_MAX_SIDE = 12_000
+DEFAULT_FORMATS = ('JPEG', 'PNG')
+
+REDUCTION_FACTORS = (8, 4, 2)
+
+# Offline tools (calibration, bulk scoring, benchmarks) read trusted local
+# files, so they get far looser limits than web uploads; Pillow still refuses
+# anything past twice its own MAX_IMAGE_PIXELS.
+OFFLINE_MAX_BYTES = 512 * 1024 * 1024
+OFFLINE_MAX_PIXELS = 150_000_000
+OFFLINE_MAX_SIDE = 65_535
+
+ImageInfo = namedtuple('ImageInfo', ['format', 'width', 'height', 'size_bytes'])
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class ImageLimits:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_pixels=DEFAULT_MAX_PIXELS,
+                 max_side=DEFAULT_MAX_SIDE, formats=DEFAULT_FORMATS):
+        self.max_bytes = int(max_bytes)
+        self.max_pixels = int(max_pixels)
+        self.max_side = int(max_side)
+        self.formats = tuple(formats)
+
+
+OFFLINE_LIMITS = ImageLimits(OFFLINE_MAX_BYTES, OFFLINE_MAX_PIXELS, OFFLINE_MAX_SIDE)
+
+
+def inspect_image(data, limits=None):
+    """Validates size, format and dimensions from the header alone; returns ImageInfo."""
+    limits = limits or ImageLimits()
+    if not data:
+        raise InvalidImage("Empty image data")
+    if len(data) > limits.max_bytes:
+        raise InvalidImage(f"Image is larger than {limits.max_bytes // (1024 * 1024)} MB")
+    try:
+        with warnings.catch_warnings():
+            # Our own pixel limit applies; Pillow's bomb warning is noise here
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(io.BytesIO(data)) as image:
+                fmt, (width, height) = image.format, image.size
+    except Image.DecompressionBombError:
+        raise InvalidImage("Image has too many pixels")
+    except Exception:
+        raise InvalidImage("Image data could not be decoded")
+
+    if fmt not in limits.formats:
+        raise InvalidImage(f"Unsupported image format {fmt}; expected {', '.join(limits.formats)}")
+    if width <= 0 or height <= 0:
+        raise InvalidImage("Image has no pixels")
+    if width > limits.max_side or height > limits.max_side or width * height > limits.max_pixels:
+        raise InvalidImage(f"Image dimensions {width}x{height} exceed the allowed limit")
+    return ImageInfo(fmt, width, height, len(data))
+
+
+def reduced_decode_flag(info, target_size):
+    """The IMREAD flag decoding `info` as small as possible while both sides stay >= target_size."""
+    import cv2
+    if info.format == 'JPEG':
+        for factor in REDUCTION_FACTORS:
+            if min(info.width, info.height) // factor >= target_size:
+                return getattr(cv2, f'IMREAD_REDUCED_COLOR_{factor}')
+    return cv2.IMREAD_COLOR
+
+
+def decode_for_model(data, target_size=224, limits=None):
+    """Raw bytes or file-like stream -> BGR uint8 array, validated and decoded near target_size."""
+    import cv2
+    import numpy as np
+    if hasattr(data, 'read'):
+        data = data.read()
+    info = inspect_image(data, limits)
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), reduced_decode_flag(info, target_size))
+    if image is None:
+        raise InvalidImage("Image data could not be decoded")
+    return image
@@ -0,0 +1,264 @@
+import copy
+import io
+import json
+import logging
+import os
+import time
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+INPUT_SHAPE = (3, 224, 224)
+BACKEND_NAMES = ('eager', 'torchscript', 'onnxruntime', 'int8')
+
+
+# --- HEAD FUSION ---
+def fuse_head_batchnorm(model):
+    """
+    Returns a copy of a SkinClassifier whose classifier head has the
+    BatchNorm1d folded into the following Linear layer (eval mode only).
+    Head layout: Dropout, Linear, ReLU, BatchNorm1d, Dropout, Linear.
+    """
+    fused = copy.deepcopy(model).eval()
+    head = fused.backbone.classifier
+    first_linear, bn, last_linear = head[1], head[3], head[5]
+
+    with torch.no_grad():
+        scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+        shift = bn.bias - bn.running_mean * scale
+        folded = nn.Linear(last_linear.in_features, last_linear.out_features)
+        folded.weight.copy_(last_linear.weight * scale.unsqueeze(0))
+        folded.bias.copy_(last_linear.bias + last_linear.weight @ shift)
+
+    # Dropout is the identity at inference time, so it is dropped as well
+    fused.backbone.classifier = nn.Sequential(first_linear, nn.ReLU(), folded)
+    return fused
+
+
+# --- BACKENDS ---
+class EagerBackend:
+    """Plain eager-mode PyTorch SkinClassifier."""
+    name = 'eager'
+
+    def __init__(self, model):
+        self.model = model.eval()
+
+    def __call__(self, inputs):
+        with torch.no_grad():
+            return self.model(inputs)
+
+
+class TorchScriptBackend:
+    """Traced and frozen TorchScript module with BatchNorm folded into Conv/Linear layers."""
+    name = 'torchscript'
+
+    def __init__(self, model, export_path=None):
+        fused = fuse_head_batchnorm(model)
+        example = torch.randn(1, *INPUT_SHAPE)
+        with torch.no_grad():
+            traced = torch.jit.trace(fused, example)
+            # freeze() inlines the weights and folds Conv+BatchNorm in the backbone
+            frozen = torch.jit.freeze(traced)
+            self.module = torch.jit.optimize_for_inference(frozen)
+        if export_path:
+            os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+            torch.jit.save(self.module, export_path)
+
+    def __call__(self, inputs):
+        with torch.no_grad():
+            return self.module(inputs)
+
+
+class OnnxRuntimeBackend:
+    """ONNX Runtime CPU session exported from the eager model."""
+    name = 'onnxruntime'
+
+    def __init__(self, model, export_path=None, intra_op_threads=None):
+        import onnxruntime as ort
+
+        fused = fuse_head_batchnorm(model)
+        buffer = io.BytesIO()
+        with torch.no_grad():
+            torch.onnx.export(
+                fused,
+                torch.randn(1, *INPUT_SHAPE),
+                buffer,
+                input_names=['input'],
+                output_names=['logits'],
+                dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+                opset_version=17
+            )
+        onnx_bytes = buffer.getvalue()
+        if export_path:
+            os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+            with open(export_path, 'wb') as f:
+                f.write(onnx_bytes)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = int(intra_op_threads)
+        self.session = ort.InferenceSession(onnx_bytes, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, inputs):
+        array = inputs.detach().cpu().contiguous().numpy()
+        outputs = self.session.run(None, {self.input_name: array})[0]
+        return torch.from_numpy(outputs)
+
+
+def quantized_report_path(artifact_path):
+    return os.path.splitext(artifact_path)[0] + '.json'
+
+class QuantizedBackend:
+    """
+    INT8 TorchScript artifact produced by quantize_model.py. Refuses artifacts
+    whose report is missing, failed its agreement check, or was built from a
+    different checkpoint than `expected_fingerprint`.
+    """
+    name = 'int8'
+
+    def __init__(self, artifact_path, expected_fingerprint=None):
+        with open(quantized_report_path(artifact_path), 'r') as f:
+            self.report = json.load(f)
+        if not self.report.get('passed'):
+            raise ValueError(f"Quantized artifact {artifact_path} did not pass its agreement check")
+        if expected_fingerprint and self.report.get('source_fingerprint') != expected_fingerprint:
+            raise ValueError(f"Quantized artifact {artifact_path} was built from a different checkpoint")
+        self.module = torch.jit.load(artifact_path, map_location='cpu')
+        self.module.eval()
+
+    def __call__(self, inputs):
+        with torch.no_grad():
+            return self.module(inputs)
+
+
+def build_backend(name, model, export_dir=None, quantized_path=None, expected_fingerprint=None):
+    """Wraps an eager SkinClassifier in the requested inference backend."""
+    name = (name or 'eager').lower()
+    if name == 'eager':
+        return EagerBackend(model)
+    if name == 'torchscript':
+        export_path = os.path.join(export_dir, 'skin_classifier_frozen.pt') if export_dir else None
+        return TorchScriptBackend(model, export_path=export_path)
+    if name == 'onnxruntime':
+        export_path = os.path.join(export_dir, 'skin_classifier.onnx') if export_dir else None
+        return OnnxRuntimeBackend(model, export_path=export_path)
+    if name == 'int8':
+        if not quantized_path:
+            raise ValueError("The 'int8' backend needs the path of a quantized artifact")
+        return QuantizedBackend(quantized_path, expected_fingerprint=expected_fingerprint)
+    raise ValueError(f"Unknown inference backend '{name}'. Expected one of {BACKEND_NAMES}")
+
+
+# --- PARITY / SPEED CHECKS ---
+def parity_check(backend, reference_model, num_samples=8, atol=1e-4, seed=0, inputs=None):
+    """
+    Compares a backend's softmax probabilities against eager mode on sample
+    inputs. Returns a report dict; report['passed'] is False on any mismatch.
+    """
+    if inputs is None:
+        generator = torch.Generator().manual_seed(seed)
+        inputs = torch.randn(num_samples, *INPUT_SHAPE, generator=generator)
+
+    reference_model.eval()
+    with torch.no_grad():
+        expected = torch.softmax(reference_model(inputs), dim=1)
+    actual = torch.softmax(backend(inputs).float(), dim=1)
+
+    max_abs_diff = (expected - actual).abs().max().item()
+    top1_agreement = (expected.argmax(dim=1) == actual.argmax(dim=1)).float().mean().item()
+    return {
+        'backend': backend.name,
+        'samples': inputs.shape[0],
+        'max_abs_diff': max_abs_diff,
+        'top1_agreement': top1_agreement,
+        'atol': atol,
+        'passed': max_abs_diff <= atol and top1_agreement == 1.0,
+    }
+
+def measure_latency(backend, batch_size=1, iterations=20, warmup=3):
+    """Mean forward-pass latency in milliseconds for the given batch size."""
+    inputs = torch.randn(batch_size, *INPUT_SHAPE)
+    for _ in range(warmup):
+        backend(inputs)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        backend(inputs)
+    return (time.perf_counter() - started) / iterations * 1000.0
+
+def compare_backends(model, names=('eager', 'torchscript', 'onnxruntime'), batch_size=1, atol=1e-4):
+    """Builds each backend, checks parity against eager and times it."""
+    results = []
+    for name in names:
+        try:
+            backend = build_backend(name, model)
+        except Exception as e:
+            results.append({'backend': name, 'error': str(e), 'passed': False})
+            continue
+        report = parity_check(backend, model, atol=atol)
+        report['latency_ms'] = measure_latency(backend, batch_size=batch_size)
+        results.append(report)
+    return results
+
+def select_backend(name, model, quantized_path=None, expected_fingerprint=None):
+    """
+    Builds the configured backend and gates it: float engines must match eager
+    probabilities on sample inputs, 'int8' relies on its quantization report.
+    Falls back to eager mode on any failure.
+    """
+    try:
+        backend = build_backend(
+            name,
+            model,
+            quantized_path=quantized_path,
+            expected_fingerprint=expected_fingerprint
+        )
+        if backend.name == 'int8':
+            logger.info("Serving INT8 model", extra={'fields': {
+                'top1_agreement': round(backend.report['top1_agreement'], 4),
+            }})
+        elif backend.name != 'eager':
+            parity = parity_check(backend, model)
+            logger.info("Backend parity check", extra={'fields': parity})
+            if not parity['passed']:
+                logger.warning("Backend failed parity check, falling back to eager mode",
+                               extra={'fields': {'backend': backend.name}})
+                backend = build_backend('eager', model)
+    except Exception as e:
+        logger.warning("Could not build backend, falling back to eager mode: %s", e,
+                       extra={'fields': {'backend': name}})
+        backend = build_backend('eager', model)
+    return backend
+
+def fastest_correct_backend(results):
+    """Name of the quickest backend that passed its parity check."""
+    passed = [r for r in results if r.get('passed')]
+    if not passed:
+        return 'eager'
+    return min(passed, key=lambda r: r['latency_ms'])['backend']
+
+
+if __name__ == '__main__':
+    import argparse
+    from standalone_predictor import load_model_and_encoder
+
+    parser = argparse.ArgumentParser(description="Compare inference backends against eager PyTorch.")
+    parser.add_argument('--model', default='skin_disease_efficientnet_model1.pth')
+    parser.add_argument('--encoder', default='label_encoder_mode1.pkl')
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--atol', type=float, default=1e-4)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    eager_model, _ = load_model_and_encoder(args.model, args.encoder)
+    results = compare_backends(eager_model, batch_size=args.batch_size, atol=args.atol)
+    for r in results:
+        if 'error' in r:
+            print(f"{r['backend']:<12} ERROR: {r['error']}")
+        else:
+            print(f"{r['backend']:<12} latency={r['latency_ms']:.2f}ms "
+                  f"max_abs_diff={r['max_abs_diff']:.2e} passed={r['passed']}")
+    print(f"Fastest correct backend: {fastest_correct_backend(results)}")
@@ -0,0 +1,202 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+# --- LOADED MODEL VERSION ---
+class ModelVersion:
+    """
+    One loaded checkpoint/encoder pair together with the inference backend and
+    micro-batching scheduler serving it. `version` is the model fingerprint.
+    """
+
+    def __init__(self, version, model_path, encoder_path, model, label_encoder, backend, scheduler):
+        self.version = version
+        self.model_path = model_path
+        self.encoder_path = encoder_path
+        self.model = model
+        self.label_encoder = label_encoder
+        self.backend = backend
+        self.scheduler = scheduler
+        self.loaded_at = time.time()
+        self.load_seconds = None
+        self.leases = 0
+
+    def close(self):
+        """Stops the scheduler (serving what is queued) and any worker processes."""
+        self.scheduler.shutdown()
+        if hasattr(self.backend, 'shutdown'):
+            self.backend.shutdown()
+
+    def describe(self):
+        return {
+            'model_version': self.version,
+            'model_path': self.model_path,
+            'encoder_path': self.encoder_path,
+            'loaded_at': self.loaded_at,
+            'load_seconds': self.load_seconds,
+            'in_flight': self.leases,
+        }
+
+
+class NoModelLoaded(RuntimeError):
+    pass
+
+
+# --- REGISTRY ---
+class ModelRegistry:
+    """
+    Holds the active model version and the one it replaced. load() builds and
+    warms a new version with `build(model_path, encoder_path)` while the active
+    one keeps serving, then swaps it in under a lock: requests that already
+    hold a lease from use() finish on the version they started with, new ones
+    get the new version. The replaced version stays loaded for rollback(); the
+    version before it is closed once its last lease is returned.
+    `on_swap(version)` runs whenever the active version changes; swaps and
+    their notifications are serialized, so callbacks see versions in the
+    order they became active. One load runs at a time.
+    With `fingerprint(model_path, encoder_path)`, a checkpoint that is
+    already active or previous is not built again: the loaded version is
+    reused, so a version is never closed while an identical one serves.
+    """
+
+    def __init__(self, build, on_swap=None, drain_timeout=60.0, fingerprint=None):
+        self.build = build
+        self.fingerprint = fingerprint
+        self.on_swap = on_swap
+        self.drain_timeout = float(drain_timeout)
+        self.active = None
+        self.previous = None
+        self._cond = threading.Condition()
+        # Guards `loading`; held only briefly
+        self._lock = threading.Lock()
+        # Held across a swap and its on_swap notification
+        self._swap_lock = threading.Lock()
+        self.loading = None
+        self.last_error = None
+        self.swaps = 0
+
+    @contextmanager
+    def use(self):
+        """Leases the active version for the duration of one request."""
+        with self._cond:
+            version = self.active
+            if version is None:
+                raise NoModelLoaded('No model version is loaded')
+            version.leases += 1
+        try:
+            yield version
+        finally:
+            with self._cond:
+                version.leases -= 1
+                self._cond.notify_all()
+
+    def _claim_load(self, model_path, encoder_path):
+        with self._lock:
+            if self.loading is not None:
+                return False
+            self.loading = {'model_path': model_path, 'encoder_path': encoder_path, 'started_at': time.time()}
+            return True
+
+    def load(self, model_path, encoder_path):
+        """Builds, warms and activates a checkpoint; blocks until it serves traffic."""
+        if not self._claim_load(model_path, encoder_path):
+            raise RuntimeError('A model load is already in progress')
+        return self._load_claimed(model_path, encoder_path)
+
+    def _load_claimed(self, model_path, encoder_path):
+        try:
+            if self.fingerprint is not None:
+                fingerprint = self.fingerprint(model_path, encoder_path)
+                with self._swap_lock:
+                    if self.active is not None and self.active.version == fingerprint:
+                        return self.active
+                    if self.previous is not None and self.previous.version == fingerprint:
+                        self.last_error = None
+                        return self._swap_previous()
+            started = time.perf_counter()
+            try:
+                version = self.build(model_path, encoder_path)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            version.load_seconds = time.perf_counter() - started
+            self.last_error = None
+
+            if self.active is not None and version.version == self.active.version:
+                # Same fingerprint as what is serving: nothing to switch
+                version.close()
+                return self.active
+            self._activate(version)
+            return version
+        finally:
+            with self._lock:
+                self.loading = None
+
+    def load_async(self, model_path, encoder_path):
+        """Starts a load on a background thread; False if a load is already running."""
+        if not self._claim_load(model_path, encoder_path):
+            return False
+
+        def run():
+            try:
+                self._load_claimed(model_path, encoder_path)
+            except Exception:
+                logger.exception("Model load failed", extra={'fields': {'model_path': model_path}})
+
+        threading.Thread(target=run, name='model-registry-load', daemon=True).start()
+        return True
+
+    def rollback(self):
+        """Makes the previous version active again and keeps the current one as previous."""
+        with self._swap_lock:
+            return self._swap_previous()
+
+    def _swap_previous(self):
+        # Caller holds _swap_lock
+        with self._cond:
+            if self.previous is None:
+                raise NoModelLoaded('No previous model version to roll back to')
+            self.active, self.previous = self.previous, self.active
+            self.swaps += 1
+            active = self.active
+        self._notify(active)
+        return active
+
+    def _activate(self, version):
+        with self._swap_lock:
+            with self._cond:
+                retired = self.previous
+                self.previous = self.active
+                self.active = version
+                self.swaps += 1
+            self._notify(version)
+        if retired is not None:
+            threading.Thread(target=self._retire, args=(retired,), name='model-registry-retire', daemon=True).start()
+
+    def _notify(self, version):
+        logger.info("Model version activated", extra={'fields': {'model_version': version.version}})
+        if self.on_swap is not None:
+            self.on_swap(version)
+
+    def _retire(self, version):
+        """Closes a version once the requests still using it are done."""
+        with self._cond:
+            drained = self._cond.wait_for(lambda: version.leases == 0, timeout=self.drain_timeout)
+        if not drained:
+            logger.warning("Closing model version with requests still in flight",
+                           extra={'fields': {'model_version': version.version, 'in_flight': version.leases}})
+        version.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self.active.describe() if self.active else None,
+                'previous': self.previous.describe() if self.previous else None,
+                'loading': dict(self.loading) if self.loading is not None else None,
+                'last_error': self.last_error,
+                'swaps': self.swaps,
+            }
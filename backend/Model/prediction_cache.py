@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+
+# --- MODEL FINGERPRINT ---
+def file_digest(path, chunk_size=1 << 20):
+    """Streams a file through SHA-256 and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def model_fingerprint(model_path, encoder_path):
+    """Version string that changes whenever the .pth or the label encoder changes."""
+    combined = hashlib.sha256()
+    combined.update(file_digest(model_path).encode('ascii'))
+    combined.update(file_digest(encoder_path).encode('ascii'))
+    return combined.hexdigest()[:16]
+
+
+# --- CONTENT-ADDRESSED PREDICTION CACHE ---
+class PredictionCache:
+    """
+    LRU + TTL cache of prediction results keyed on sha256(image bytes) and the
+    model version. An optional on-disk tier (one JSON file per entry, sharded
+    by key prefix) is shared between processes and survives restarts.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, disk_dir=None, model_version=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.disk_dir = disk_dir
+        self.model_version = model_version
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def make_key(self, image_bytes):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f"{self.model_version}:{digest}"
+
+    def set_model_version(self, model_version):
+        """Switches model version; every entry produced by the old model is dropped."""
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            self.model_version = model_version
+            self._entries.clear()
+            self.invalidations += 1
+        self._purge_disk(keep_version=model_version)
+
+    # --- lookup / store ---
+    def get(self, image_bytes):
+        key = self.make_key(image_bytes)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is not None:
+                self.disk_hits += 1
+                self._store_locked(key, value, now)
+            else:
+                self.misses += 1
+        return value
+
+    def put(self, image_bytes, value, model_version=None):
+        """Stores a result; one computed by `model_version` is dropped if that is no longer current."""
+        now = time.time()
+        with self._lock:
+            if model_version is not None and model_version != self.model_version:
+                return
+            key = self.make_key(image_bytes)
+            self._store_locked(key, value, now)
+        self._disk_put(key, value, now)
+
+    def get_or_compute(self, image_bytes, compute_fn, model_version=None):
+        """Returns the cached result for these bytes, or computes and stores it."""
+        value = self.get(image_bytes)
+        if value is None:
+            value = compute_fn()
+            self.put(image_bytes, value, model_version)
+        return value
+
+    def _store_locked(self, key, value, now):
+        self._entries[key] = (now, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self._purge_disk(keep_version=None)
+
+    # --- disk tier ---
+    def _disk_path(self, key):
+        version, digest = key.split(':', 1)
+        return os.path.join(self.disk_dir, str(version), digest[:2], f"{digest}.json")
+
+    def _disk_get(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - entry.get('stored_at', 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.expirations += 1
+            return None
+        return entry.get('value')
+
+    def _disk_put(self, key, value, now):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'stored_at': now, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            # The disk tier is best-effort; the in-memory entry is already stored
+            pass
+
+    def _purge_disk(self, keep_version):
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return
+        for name in os.listdir(self.disk_dir):
+            if keep_version is not None and name == str(keep_version):
+                continue
+            shutil.rmtree(os.path.join(self.disk_dir, name), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'model_version': self.model_version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'disk_tier': bool(self.disk_dir),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,183 @@
+"""
+Allocation-free preprocessing for inference.
+
+Equivalent to get_inference_transforms() (Resize 224x224, ImageNet Normalize,
+ToTensorV2) but built once and run as: header check + reduced-resolution
+decode (see image_ingest.py) -> resize -> one fused
+BGR->RGB + normalise pass written straight into a preallocated, channels-last
+float32 slot. Slots are reused across requests; the tensor handed to the model
+is a zero-copy NCHW view of the slot.
+
+Benchmark (from the Model directory):
+    python preprocessing.py --iterations 200 --width 4032 --height 3024
+"""
+import queue
+import threading
+
+import cv2
+import numpy as np
+import torch
+
+try:
+    from .image_ingest import decode_for_model
+except ImportError:
+    from image_ingest import decode_for_model
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class PreparedImage:
+    """A preprocessed image living in an engine slot; release() returns the slot."""
+    __slots__ = ('tensor', '_engine', '_slot')
+
+    def __init__(self, tensor, engine=None, slot=None):
+        self.tensor = tensor
+        self._engine = engine
+        self._slot = slot
+
+    def release(self):
+        if self._engine is not None and self._slot is not None:
+            self._engine._release(self._slot)
+            self._slot = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class PreprocessingEngine:
+    def __init__(self, size=224, mean=IMAGENET_MEAN, std=IMAGENET_STD, slots=32, limits=None):
+        self.size = size
+        self.limits = limits
+        mean = np.asarray(mean, dtype=np.float32)
+        std = np.asarray(std, dtype=np.float32)
+        # (x / 255 - mean) / std  ==  x * scale + offset
+        self._scale = (1.0 / (255.0 * std)).astype(np.float32)
+        self._offset = (-mean / std).astype(np.float32)
+
+        # One contiguous NHWC block; each slot is an (H, W, C) float32 image
+        self._buffers = np.empty((slots, size, size, 3), dtype=np.float32)
+        self._resized = [np.empty((size, size, 3), dtype=np.uint8) for _ in range(slots)]
+        self._free = queue.SimpleQueue()
+        for slot in range(slots):
+            self._free.put(slot)
+        self._lock = threading.Lock()
+        self.slot_hits = 0
+        self.slot_misses = 0
+
+    # --- slots ---
+    def _acquire(self):
+        try:
+            slot = self._free.get_nowait()
+        except queue.Empty:
+            slot = None
+        with self._lock:
+            if slot is None:
+                self.slot_misses += 1
+            else:
+                self.slot_hits += 1
+        return slot
+
+    def _release(self, slot):
+        self._free.put(slot)
+
+    # --- pipeline ---
+    def decode(self, data):
+        """Raw bytes or file-like stream -> BGR uint8 array, decoded no larger than needed."""
+        return decode_for_model(data, self.size, self.limits)
+
+    def _normalize_into(self, bgr, resized, out):
+        # Resize first so the float pass only touches size x size pixels
+        cv2.resize(bgr, (self.size, self.size), dst=resized, interpolation=cv2.INTER_LINEAR)
+        # BGR->RGB is a reversed view; multiply-add writes straight into the slot
+        np.multiply(resized[..., ::-1], self._scale, out=out, casting='unsafe')
+        np.add(out, self._offset, out=out)
+        return out
+
+    def preprocess_array(self, bgr):
+        """Preprocesses an already-decoded BGR image into a slot."""
+        slot = self._acquire()
+        if slot is None:
+            # All slots are in flight; fall back to a one-off buffer
+            out = np.empty((self.size, self.size, 3), dtype=np.float32)
+            resized = np.empty((self.size, self.size, 3), dtype=np.uint8)
+        else:
+            out = self._buffers[slot]
+            resized = self._resized[slot]
+        self._normalize_into(bgr, resized, out)
+        # HWC float32 -> zero-copy CHW view (channels-last strides)
+        tensor = torch.from_numpy(out).permute(2, 0, 1)
+        return PreparedImage(tensor, self if slot is not None else None, slot)
+
+    def preprocess_bytes(self, data):
+        return self.preprocess_array(self.decode(data))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'slots': self._buffers.shape[0],
+                'slot_hits': self.slot_hits,
+                'slot_misses': self.slot_misses,
+            }
+
+
+# --- BENCHMARK ---
+def _benchmark(iterations, width, height):
+    import time
+    import tracemalloc
+    from standalone_predictor import get_inference_transforms
+
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    ok, encoded = cv2.imencode('.jpg', image)
+    data = encoded.tobytes()
+
+    def baseline():
+        # The original path: new Compose per call, BGR decode, RGB copy, Normalize, ToTensor
+        transform = get_inference_transforms()
+        bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        return transform(image=rgb)['image']
+
+    engine = PreprocessingEngine(slots=4)
+
+    def optimized():
+        prepared = engine.preprocess_bytes(data)
+        prepared.release()
+        return prepared.tensor
+
+    max_diff = (baseline() - optimized()).abs().max().item()
+
+    results = {}
+    for name, fn in (('albumentations', baseline), ('engine', optimized)):
+        fn()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        latency_ms = (time.perf_counter() - started) / iterations * 1000.0
+
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = (latency_ms, peak)
+
+    print(f"\n--- Preprocessing Benchmark ({width}x{height} JPEG, {iterations} iterations) ---")
+    for name, (latency_ms, peak) in results.items():
+        print(f"  -> {name:<15} {latency_ms:8.2f} ms/image   peak alloc {peak / 1e6:8.2f} MB/image")
+    print(f"  -> max abs difference vs albumentations: {max_diff:.2e}")
+    print("-------------------------------------------------------------\n")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the preprocessing engine against albumentations.")
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+    _benchmark(args.iterations, args.width, args.height)
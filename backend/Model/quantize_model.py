@@ -0,0 +1,190 @@
+"""
+INT8 quantization tool for the SkinClassifier.
+
+Static FX-graph quantization of the EfficientNet-B0 backbone (calibrated on a
+folder of sample images) plus dynamic quantization of the Linear head. The
+result is saved as a TorchScript artifact next to a JSON report; the artifact
+is only written when its top-1 agreement with the FP32 model meets the
+threshold.
+
+Usage (from the Model directory):
+    python quantize_model.py --calib-dir samples/ --output skin_disease_efficientnet_model1_int8.pt
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import torch
+import torch.nn as nn
+
+from standalone_predictor import load_model_and_encoder, preprocess_image, get_inference_transforms
+from image_ingest import OFFLINE_LIMITS
+from inference_backends import fuse_head_batchnorm, quantized_report_path, INPUT_SHAPE
+from prediction_cache import model_fingerprint
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+# --- DATA ---
+def list_images(folder):
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+def load_batches(paths, batch_size=16):
+    """Yields preprocessed image batches; unreadable or undecodable files are skipped."""
+    transform = get_inference_transforms()
+    batch = []
+    for path in paths:
+        try:
+            batch.append(preprocess_image(path, transform, limits=OFFLINE_LIMITS))
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[WARN] Skipping image {path}: {e}")
+            continue
+        if len(batch) == batch_size:
+            yield torch.stack(batch)
+            batch = []
+    if batch:
+        yield torch.stack(batch)
+
+
+# --- QUANTIZATION ---
+def quantize_model(model, calibration_paths, backend='x86'):
+    """Returns a quantized copy of `model`, calibrated on the given images."""
+    from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    torch.backends.quantized.engine = backend
+    fp32 = fuse_head_batchnorm(model)
+    example_inputs = (torch.randn(1, *INPUT_SHAPE),)
+
+    # Static quantization for the backbone; the head stays float for dynamic quantization
+    qconfig_mapping = get_default_qconfig_mapping(backend).set_module_name('backbone.classifier', None)
+    prepared = prepare_fx(fp32, qconfig_mapping, example_inputs)
+    with torch.no_grad():
+        for batch in load_batches(calibration_paths):
+            prepared(batch)
+    converted = convert_fx(prepared)
+
+    return quantize_dynamic(converted, {nn.Linear}, dtype=torch.qint8)
+
+
+# --- EVALUATION ---
+def compare_models(fp32_model, int8_model, eval_paths, class_names):
+    """Top-1 agreement between the two models, overall and per FP32-predicted class."""
+    agree = total = 0
+    per_class = {name: {'total': 0, 'agree': 0} for name in class_names}
+    with torch.no_grad():
+        for batch in load_batches(eval_paths):
+            expected = fp32_model(batch).argmax(dim=1)
+            actual = int8_model(batch).argmax(dim=1)
+            for e, a in zip(expected.tolist(), actual.tolist()):
+                stats = per_class[class_names[e]]
+                stats['total'] += 1
+                stats['agree'] += int(e == a)
+            agree += (expected == actual).sum().item()
+            total += batch.shape[0]
+    for stats in per_class.values():
+        stats['agreement'] = stats['agree'] / stats['total'] if stats['total'] else None
+    return {
+        'images': total,
+        'top1_agreement': agree / total if total else 0.0,
+        'per_class': per_class,
+    }
+
+def measure_latency_ms(model, iterations=20, warmup=3):
+    inputs = torch.randn(1, *INPUT_SHAPE)
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(inputs)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            model(inputs)
+    return (time.perf_counter() - started) / iterations * 1000.0
+
+def save_torchscript(model, path):
+    with torch.no_grad():
+        scripted = torch.jit.freeze(torch.jit.trace(model, torch.randn(1, *INPUT_SHAPE)))
+    torch.jit.save(scripted, path)
+    return scripted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an INT8 SkinClassifier and check it against FP32.")
+    parser.add_argument('--model', default='skin_disease_efficientnet_model1.pth')
+    parser.add_argument('--encoder', default='label_encoder_mode1.pkl')
+    parser.add_argument('--calib-dir', required=True, help='Folder of sample images used for calibration')
+    parser.add_argument('--eval-dir', help='Folder of images for the agreement check (default: --calib-dir)')
+    parser.add_argument('--output', default='skin_disease_efficientnet_model1_int8.pt')
+    parser.add_argument('--min-agreement', type=float, default=0.98)
+    parser.add_argument('--engine', default='x86', choices=['x86', 'fbgemm', 'qnnpack'])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    fp32_model, label_encoder = load_model_and_encoder(args.model, args.encoder)
+    class_names = list(label_encoder.classes_)
+
+    calibration_paths = list_images(args.calib_dir)
+    eval_paths = list_images(args.eval_dir) if args.eval_dir else calibration_paths
+    if not calibration_paths or not eval_paths:
+        print("[ERROR] No calibration/evaluation images found.")
+        return 2
+
+    print(f"[LOG] Calibrating on {len(calibration_paths)} images...")
+    int8_model = quantize_model(fp32_model, calibration_paths, backend=args.engine)
+
+    print(f"[LOG] Checking top-1 agreement on {len(eval_paths)} images...")
+    agreement = compare_models(fp32_model, int8_model, eval_paths, class_names)
+
+    # Serialize to a temporary file first so a failing artifact is never emitted
+    output_dir = os.path.dirname(os.path.abspath(args.output))
+    fd, tmp_path = tempfile.mkstemp(suffix='.pt', dir=output_dir)
+    os.close(fd)
+    try:
+        scripted = save_torchscript(int8_model, tmp_path)
+        report = {
+            'source_model': os.path.basename(args.model),
+            'source_fingerprint': model_fingerprint(args.model, args.encoder),
+            'engine': args.engine,
+            'calibration_images': len(calibration_paths),
+            'fp32_size_bytes': os.path.getsize(args.model),
+            'int8_size_bytes': os.path.getsize(tmp_path),
+            'fp32_latency_ms': measure_latency_ms(fp32_model),
+            'int8_latency_ms': measure_latency_ms(scripted),
+            'min_agreement': args.min_agreement,
+            **agreement,
+        }
+        report['passed'] = report['top1_agreement'] >= args.min_agreement
+
+        print("\n--- Quantization Report ---")
+        print(f"  -> Model size:   {report['fp32_size_bytes'] / 1e6:.1f} MB -> {report['int8_size_bytes'] / 1e6:.1f} MB")
+        print(f"  -> Latency:      {report['fp32_latency_ms']:.1f} ms -> {report['int8_latency_ms']:.1f} ms")
+        print(f"  -> Top-1 agreement: {report['top1_agreement']:.4f} (threshold {args.min_agreement})")
+        for name, stats in agreement['per_class'].items():
+            if stats['total']:
+                print(f"     {name}: {stats['agreement']:.4f} over {stats['total']} images")
+        print("---------------------------\n")
+
+        if not report['passed']:
+            print("[ERROR] Agreement below threshold; no artifact written.")
+            return 1
+
+        os.replace(tmp_path, args.output)
+        with open(quantized_report_path(args.output), 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[SUCCESS] Quantized model written to {args.output}")
+        return 0
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,17 +1,31 @@
+import logging
+import time
+
 import torch
 import torch.nn as nn
 from torchvision import models
 import joblib
 import cv2
+import numpy as np
 import albumentations as A
 from albumentations.pytorch import ToTensorV2
 from collections import OrderedDict
 
+try:
+    from .image_ingest import decode_for_model
+except ImportError:
+    from image_ingest import decode_for_model
+
+logger = logging.getLogger(__name__)
+
 # --- MODEL DEFINITION (from your notebook) ---
 class SkinClassifier(nn.Module):
-    def __init__(self, num_classes, dropout_rate=0.4):
+    def __init__(self, num_classes, dropout_rate=0.4, pretrained=True):
         super().__init__()
-        self.backbone = models.efficientnet_b0(weights=models.EfficientNet_B0_Weights.DEFAULT)
+        # ImageNet weights only matter for training; inference overwrites them
+        # with the checkpoint, so loaders pass pretrained=False
+        weights = models.EfficientNet_B0_Weights.DEFAULT if pretrained else None
+        self.backbone = models.efficientnet_b0(weights=weights)
         in_features = self.backbone.classifier[1].in_features
         self.backbone.classifier = nn.Sequential(
             nn.Dropout(p=dropout_rate),
@@ -24,6 +38,16 @@ class SkinClassifier(nn.Module):
     def forward(self, x):
         return self.backbone(x)
 
+    def embed(self, x):
+        """512-d head representation: pooled features through Linear, ReLU and BatchNorm."""
+        features = torch.flatten(self.backbone.avgpool(self.backbone.features(x)), 1)
+        return self.backbone.classifier[:4](features)
+
+    def forward_with_embedding(self, x):
+        """(embedding, logits) from a single forward pass."""
+        embedding = self.embed(x)
+        return embedding, self.backbone.classifier[4:](embedding)
+
 # --- TRANSFORMS DEFINITION (from your notebook) ---
 def get_inference_transforms():
     return A.Compose([
@@ -32,86 +56,138 @@ def get_inference_transforms():
         ToTensorV2(),
     ])
 
-# --- MODEL AND ENCODER LOADING (with logs) ---
+# --- CHECKPOINT LOADING ---
+def load_checkpoint(model_path):
+    """Loads a state dict memory-mapped, so weights are paged in from the file on demand."""
+    try:
+        return torch.load(model_path, map_location='cpu', mmap=True, weights_only=True)
+    except (TypeError, RuntimeError):
+        # torch < 2.1 (no mmap) or a legacy, non-zip checkpoint
+        return torch.load(model_path, map_location=torch.device('cpu'))
+
+def build_model_from_checkpoint(state_dict, num_classes):
+    """
+    Builds SkinClassifier without pretrained weights. Parameters are created on
+    the meta device and the checkpoint tensors are assigned in place, so no
+    throwaway random initialisation is allocated.
+    """
+    try:
+        with torch.device('meta'):
+            model = SkinClassifier(num_classes=num_classes, pretrained=False)
+        model.load_state_dict(state_dict, assign=True)
+    except (TypeError, AttributeError):
+        # Older torch without meta-device context or load_state_dict(assign=...)
+        model = SkinClassifier(num_classes=num_classes, pretrained=False)
+        model.load_state_dict(state_dict)
+    return model
+
+# --- MODEL AND ENCODER LOADING ---
 def load_model_and_encoder(model_path, encoder_path):
-    """Loads the model and label encoder with detailed logging."""
-    print("\n" + "="*60)
-    print("DERMACARE AI: Initializing Model Loading Process...")
-    print("="*60)
-    
-    # Load encoder
-    print(f"[LOG] Attempting to load label encoder from: {encoder_path}")
+    """Loads the model and label encoder."""
+    started = time.perf_counter()
+    logger.info("Loading label encoder", extra={'fields': {'path': encoder_path}})
     with open(encoder_path, 'rb') as f:
         label_encoder = joblib.load(f)
-    print("[SUCCESS] Label encoder loaded successfully.")
-    
-    # Get number of classes
+
     num_classes = len(label_encoder.classes_)
-    print(f"[INFO] Detected {num_classes} classes from the encoder.")
-    print(f"[INFO] Classes: {list(label_encoder.classes_)}")
-    
-    # Instantiate model
-    print(f"[LOG] Initializing SkinClassifier model architecture for {num_classes} classes...")
-    model = SkinClassifier(num_classes=num_classes)
-    print("[SUCCESS] Model architecture created.")
-
-    # Load model weights
-    print(f"[LOG] Attempting to load model weights from: {model_path}")
-    state_dict = torch.load(model_path, map_location=torch.device('cpu'))
-    model.load_state_dict(state_dict)
+    logger.info("Label encoder loaded", extra={'fields': {
+        'num_classes': num_classes, 'classes': list(label_encoder.classes_)
+    }})
+
+    # Weights are memory-mapped and assigned straight into the model
+    logger.info("Loading model weights", extra={'fields': {'path': model_path}})
+    state_dict = load_checkpoint(model_path)
+    model = build_model_from_checkpoint(state_dict, num_classes)
     model.eval()
-    print("[SUCCESS] Model weights loaded and model set to evaluation mode.")
-    
-    print("\n" + "="*60)
-    print("DERMACARE AI: Model is ready for predictions.")
-    print("="*60 + "\n")
-    
+    logger.info("Model ready for predictions", extra={'fields': {
+        'load_seconds': round(time.perf_counter() - started, 3)
+    }})
     return model, label_encoder
 
-# --- PREDICTION FUNCTION (with logs) ---
-def predict_image(image_path, model, label_encoder):
-    """Makes a prediction on a single image with detailed logging."""
-    print("\n" + "-"*60)
-    print("DERMACARE AI: Received new image for prediction.")
-    print(f"[INFO] Image path: {image_path}")
-    print("-"*60)
-    
-    # Get transforms
-    transform = get_inference_transforms()
-    
-    # Load image
-    print("[LOG] Loading image with OpenCV...")
-    image = cv2.imread(image_path)
-    if image is None:
-        print(f"[ERROR] Failed to read image at path: {image_path}")
+# --- PREPROCESSING / DECODING HELPERS ---
+def preprocess_image(image_path, transform=None, limits=None):
+    """
+    Reads an image from disk and returns the transformed CHW tensor. Raises
+    InvalidImage (a ValueError) for files outside `limits` (upload limits by default).
+    """
+    if transform is None:
+        transform = get_inference_transforms()
+    try:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+    except OSError:
         raise FileNotFoundError(f"Image not found or could not be read at {image_path}")
-    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    print("[SUCCESS] Image loaded and color space converted to RGB.")
+    image = cv2.cvtColor(decode_for_model(data, limits=limits), cv2.COLOR_BGR2RGB)
+    return transform(image=image)['image']
 
-    # Apply transformations
-    print("[LOG] Applying Albumentations transformations (Resize, Normalize, ToTensor)...")
-    preprocessed_image = transform(image=image)['image']
-    image_tensor = preprocessed_image.unsqueeze(0)
-    print(f"[SUCCESS] Image transformed. Tensor shape: {image_tensor.shape}")
+def decode_image_bytes(data):
+    """Decodes raw image bytes (or a file-like stream) into an RGB array, without touching disk."""
+    return cv2.cvtColor(decode_for_model(data), cv2.COLOR_BGR2RGB)
 
-    # Make prediction
-    print("[LOG] Performing model inference (torch.no_grad)...")
-    with torch.no_grad():
-        outputs = model(image_tensor)
-        probabilities = torch.nn.functional.softmax(outputs, dim=1)
-        confidence, predicted_idx = torch.max(probabilities, 1)
-    print("[SUCCESS] Model inference complete.")
+def preprocess_image_bytes(data, transform=None):
+    """In-memory counterpart of preprocess_image."""
+    if transform is None:
+        transform = get_inference_transforms()
+    image = decode_image_bytes(data)
+    return transform(image=image)['image']
+
+def synthetic_image_bytes(size=256):
+    """A small encoded JPEG, used to warm up the decode/transform/forward path."""
+    image = np.full((size, size, 3), 127, dtype=np.uint8)
+    ok, encoded = cv2.imencode('.jpg', image)
+    return encoded.tobytes()
 
-    # Decode the prediction
+def decode_prediction(probabilities, label_encoder):
+    """Turns a 1-D softmax vector into the API response dict."""
+    confidence, predicted_idx = torch.max(probabilities, 0)
     predicted_label = label_encoder.inverse_transform([predicted_idx.item()])[0]
-    final_confidence = confidence.item()
-    
-    print("\n--- Prediction Result ---")
-    print(f"  -> Predicted Class: '{predicted_label}'")
-    print(f"  -> Confidence Score: {final_confidence:.4f}")
-    print("-------------------------\n")
-    
     return {
         'predicted_class': predicted_label,
-        'confidence': final_confidence
-    }
\ No newline at end of file
+        'confidence': confidence.item()
+    }
+
+def predict_with_embedding(model, image_tensor):
+    """
+    One forward pass for a CHW tensor -> (softmax probabilities, float32
+    embedding array). The embedding is None for models that don't expose
+    forward_with_embedding; those are called directly for the logits.
+    """
+    with torch.no_grad():
+        batch = image_tensor.unsqueeze(0)
+        if hasattr(model, 'forward_with_embedding'):
+            embedding, outputs = model.forward_with_embedding(batch)
+        else:
+            embedding, outputs = None, model(batch)
+        probabilities = torch.nn.functional.softmax(outputs, dim=1)
+    return probabilities[0], embedding[0].numpy() if embedding is not None else None
+
+# --- PREDICTION FUNCTION ---
+def predict_image(image_path, model, label_encoder, return_embedding=False):
+    """Makes a prediction on a single image read from disk."""
+    started = time.perf_counter()
+    image_tensor = preprocess_image(image_path)
+    preprocessed = time.perf_counter()
+
+    probabilities, embedding = predict_with_embedding(model, image_tensor)
+    inferred = time.perf_counter()
+
+    result = decode_prediction(probabilities, label_encoder)
+    if return_embedding and embedding is not None:
+        result['embedding'] = embedding.tolist()
+    # Runs once per request, so the log line is sampled
+    logger.debug("Prediction complete", extra={'sampled': True, 'fields': {
+        'image_path': image_path,
+        'predicted_class': result['predicted_class'],
+        'confidence': round(result['confidence'], 4),
+        'preprocess_ms': round((preprocessed - started) * 1000.0, 2),
+        'inference_ms': round((inferred - preprocessed) * 1000.0, 2),
+    }})
+    return result
+
+def predict_image_bytes(data, model, label_encoder, return_embedding=False):
+    """Makes a prediction on raw image bytes or a file-like stream, entirely in memory."""
+    probabilities, embedding = predict_with_embedding(model, preprocess_image_bytes(data))
+    result = decode_prediction(probabilities, label_encoder)
+    if return_embedding and embedding is not None:
+        result['embedding'] = embedding.tolist()
+    return result
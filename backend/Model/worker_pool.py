@@ -0,0 +1,263 @@
+import itertools
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as mp
+
+from .inference_backends import select_backend
+
+logger = logging.getLogger(__name__)
+
+
+# --- WORKER PROCESS ---
+def _configure_threads(intra_op_threads, inter_op_threads):
+    torch.set_num_threads(intra_op_threads)
+    try:
+        torch.set_num_interop_threads(inter_op_threads)
+    except RuntimeError:
+        # Inter-op pool was already started in this process; keep its size
+        pass
+
+def _load_backend(model_path, encoder_path, backend_config):
+    from .standalone_predictor import load_model_and_encoder
+    # The checkpoint is memory-mapped, so workers share its pages through the page cache
+    model, _ = load_model_and_encoder(model_path, encoder_path)
+    return select_backend(model=model, **backend_config)
+
+def _worker_main(worker_id, intra_op_threads, inter_op_threads, request_queue, result_queue):
+    _configure_threads(intra_op_threads, inter_op_threads)
+    backends = {}
+    result_queue.put(('ready', worker_id, None, None))
+
+    while True:
+        item = request_queue.get()
+        if item is None:
+            break
+        kind, request_id, load_id = item[:3]
+        try:
+            if kind == 'load':
+                model_path, encoder_path, backend_config = item[3:]
+                backends[load_id] = _load_backend(model_path, encoder_path, backend_config)
+                result_queue.put(('result', worker_id, request_id, backends[load_id].name))
+            elif kind == 'unload':
+                backends.pop(load_id, None)
+            else:
+                with torch.no_grad():
+                    outputs = backends[load_id](item[3])
+                result_queue.put(('result', worker_id, request_id, outputs))
+        except Exception as e:
+            result_queue.put(('error', worker_id, request_id, repr(e)))
+
+
+# --- WORKER POOL ---
+class InferenceWorkerPool:
+    """
+    N inference processes, forked once when the pool is created. Create it
+    before the process starts any threads (MongoDB monitors, the model loader,
+    schedulers, OpenMP): a child forked while another thread holds a lock
+    inherits that lock held forever.
+
+    Model versions are loaded into the running workers with load(), each
+    worker reading the memory-mapped checkpoint itself and building the
+    configured backend with explicit intra-op/inter-op thread counts. A hot
+    swap therefore never forks. Every load gets its own id, so reloading a
+    checkpoint and then unloading the older copy never touches the newer one.
+    Batches go to the worker with the fewest in-flight requests.
+    """
+
+    def __init__(self, num_workers=2, intra_op_threads=None, inter_op_threads=1, ready_timeout=60):
+        self.num_workers = max(1, int(num_workers))
+        cpu_count = os.cpu_count() or 1
+        self.intra_op_threads = intra_op_threads or max(1, cpu_count // self.num_workers)
+        self.inter_op_threads = max(1, int(inter_op_threads))
+
+        ctx = mp.get_context('fork')
+        self._result_queue = ctx.Queue()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count()
+        self._load_ids = itertools.count(1)
+        self._workers = []
+        for worker_id in range(self.num_workers):
+            request_queue = ctx.Queue()
+            process = ctx.Process(
+                target=_worker_main,
+                args=(worker_id, self.intra_op_threads, self.inter_op_threads,
+                      request_queue, self._result_queue),
+                name=f'inference-worker-{worker_id}',
+                daemon=True
+            )
+            process.start()
+            self._workers.append({
+                'process': process,
+                'queue': request_queue,
+                'in_flight': 0,
+                'completed': 0,
+                'backends': {},
+                'alive': True,
+            })
+
+        self._wait_until_ready(ready_timeout)
+        self._running = True
+        # Started on the first load(), so creating the pool leaves no thread behind
+        self._listener = None
+
+    def _wait_until_ready(self, timeout):
+        waiting = set(range(self.num_workers))
+        while waiting:
+            try:
+                kind, worker_id, _, _ = self._result_queue.get(timeout=timeout)
+            except queue.Empty:
+                raise RuntimeError(f"Inference workers {sorted(waiting)} did not start in time")
+            waiting.discard(worker_id)
+
+    def _start_listener(self):
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(target=self._listen, name='inference-pool-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while self._running:
+            try:
+                kind, worker_id, request_id, payload = self._result_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._reap_dead_workers()
+                continue
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+                if entry is not None:
+                    worker = self._workers[worker_id]
+                    worker['in_flight'] -= 1
+                    worker['completed'] += 1
+            if entry is None:
+                continue
+            future = entry[1]
+            if kind == 'result':
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Inference worker {worker_id} failed: {payload}"))
+
+    def _reap_dead_workers(self):
+        """Fails requests stuck on a worker that died and stops routing to it."""
+        failed = []
+        with self._lock:
+            for worker_id, worker in enumerate(self._workers):
+                if worker['alive'] and not worker['process'].is_alive():
+                    worker['alive'] = False
+                    worker['in_flight'] = 0
+                    for request_id, (owner, future) in list(self._pending.items()):
+                        if owner == worker_id:
+                            del self._pending[request_id]
+                            failed.append((worker_id, future))
+        for worker_id, future in failed:
+            future.set_exception(RuntimeError(f"Inference worker {worker_id} exited unexpectedly"))
+
+    def _send(self, worker_id, kind, load_id, *payload):
+        """Queues a command for one worker; returns a Future of its reply."""
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = (worker_id, future)
+            self._workers[worker_id]['in_flight'] += 1
+        self._workers[worker_id]['queue'].put((kind, request_id, load_id) + payload)
+        return future
+
+    # --- MODEL VERSIONS ---
+    def load(self, version, model_path, encoder_path, backend_name='eager', quantized_path=None,
+             timeout=300):
+        """Loads a model version into every live worker; returns a backend serving it."""
+        self._start_listener()
+        with self._lock:
+            load_id = f'{version}-{next(self._load_ids)}'
+        backend_config = {
+            'name': backend_name,
+            'quantized_path': quantized_path,
+            'expected_fingerprint': version,
+        }
+        with self._lock:
+            alive = [i for i, w in enumerate(self._workers) if w['alive']]
+        if not alive:
+            raise RuntimeError("No inference workers available")
+        futures = {
+            worker_id: self._send(worker_id, 'load', load_id, model_path, encoder_path, backend_config)
+            for worker_id in alive
+        }
+        try:
+            for worker_id, future in futures.items():
+                self._workers[worker_id]['backends'][load_id] = future.result(timeout)
+        except Exception:
+            self.unload(load_id)
+            raise
+        logger.info("Inference worker pool loaded model", extra={'fields': {
+            'model_version': version, 'load_id': load_id, 'workers': len(alive),
+            'intra_op_threads': self.intra_op_threads, 'inter_op_threads': self.inter_op_threads,
+        }})
+        return PoolBackend(self, load_id)
+
+    def unload(self, load_id):
+        """Drops one load() from every worker."""
+        for worker in self._workers:
+            worker['backends'].pop(load_id, None)
+            if worker['alive']:
+                worker['queue'].put(('unload', None, load_id))
+
+    def submit_batch(self, load_id, inputs):
+        """Dispatches a batch to the least-loaded worker; returns a Future of its logits."""
+        with self._lock:
+            alive = [i for i, w in enumerate(self._workers) if w['alive'] and load_id in w['backends']]
+            if not self._running or not alive:
+                raise RuntimeError("No inference workers available")
+            worker_id = min(alive, key=lambda i: self._workers[i]['in_flight'])
+        return self._send(worker_id, 'infer', load_id, inputs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': [
+                    {
+                        'pid': w['process'].pid,
+                        'alive': w['alive'],
+                        'backends': dict(w['backends']),
+                        'in_flight': w['in_flight'],
+                        'completed': w['completed'],
+                    }
+                    for w in self._workers
+                ],
+                'intra_op_threads': self.intra_op_threads,
+                'inter_op_threads': self.inter_op_threads,
+            }
+
+    def shutdown(self, timeout=5):
+        self._running = False
+        for worker in self._workers:
+            worker['queue'].put(None)
+        for worker in self._workers:
+            worker['process'].join(timeout)
+
+
+class PoolBackend:
+    """One load() of a model version in the pool, used like any other backend."""
+    name = 'pool'
+
+    def __init__(self, pool, load_id):
+        self.pool = pool
+        self.load_id = load_id
+
+    def submit_batch(self, inputs):
+        return self.pool.submit_batch(self.load_id, inputs)
+
+    def __call__(self, inputs):
+        return self.submit_batch(inputs).result()
+
+    def stats(self):
+        return self.pool.stats()
+
+    def shutdown(self):
+        """Releases this load in the workers; the processes keep running."""
+        self.pool.unload(self.load_id)
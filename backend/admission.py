@@ -0,0 +1,124 @@
+import math
+import threading
+import time
+
+
+# --- ADMISSION CONTROL ---
+# At most `max_in_flight` requests run inference at once and at most
+# `max_queue` wait for a slot, for no longer than `queue_timeout` seconds or
+# the request's own deadline. Anything beyond that is rejected immediately, so
+# a spike costs some callers a fast 503 instead of costing everyone a timeout.
+
+class Overloaded(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def deadline_from_header(value, now=None):
+    """Monotonic deadline from a remaining-budget header in milliseconds, or None."""
+    if value is None or value == '':
+        return None
+    try:
+        budget_ms = float(value)
+    except (TypeError, ValueError):
+        raise ValueError('X-Request-Deadline-Ms must be a number of milliseconds')
+    if budget_ms <= 0:
+        raise DeadlineExceeded('Request deadline already passed')
+    return (now if now is not None else time.monotonic()) + budget_ms / 1000.0
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=16, max_queue=64, queue_timeout=2.0):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'queue_timeout': 0, 'deadline': 0}
+        # Moving average of how long an admitted request holds its slot
+        self._service_time = 0.1
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained, at least 1."""
+        backlog = self.in_flight + self.queued
+        return max(1, math.ceil(backlog / self.max_in_flight * self._service_time))
+
+    def _reject(self, reason, message):
+        self.rejected[reason] += 1
+        if reason == 'deadline':
+            return DeadlineExceeded(message)
+        return Overloaded(message, self.retry_after())
+
+    def acquire(self, deadline=None):
+        with self._cond:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise self._reject('deadline', 'Request deadline already passed')
+            if self.in_flight < self.max_in_flight:
+                self.in_flight += 1
+                self.admitted += 1
+                return
+            if self.queued >= self.max_queue:
+                raise self._reject('queue_full', 'Server is at capacity, retry later')
+
+            wait_until = time.monotonic() + self.queue_timeout
+            if deadline is not None:
+                wait_until = min(wait_until, deadline)
+            self.queued += 1
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = wait_until - time.monotonic()
+                    if remaining <= 0:
+                        if deadline is not None and time.monotonic() >= deadline:
+                            raise self._reject('deadline', 'Request deadline passed while queued')
+                        raise self._reject('queue_timeout', 'Server is at capacity, retry later')
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+            self.in_flight += 1
+            self.admitted += 1
+
+    def release(self, held_seconds=None):
+        with self._cond:
+            self.in_flight -= 1
+            if held_seconds is not None:
+                self._service_time = 0.9 * self._service_time + 0.1 * held_seconds
+            self._cond.notify()
+
+    def admit(self, deadline=None):
+        return _Admission(self, deadline)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'queue_timeout_seconds': self.queue_timeout,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'avg_service_seconds': self._service_time,
+            }
+
+
+class _Admission:
+    __slots__ = ('controller', 'deadline', 'started')
+
+    def __init__(self, controller, deadline):
+        self.controller = controller
+        self.deadline = deadline
+
+    def __enter__(self):
+        self.controller.acquire(self.deadline)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.controller.release(time.perf_counter() - self.started)
@@ -0,0 +1,324 @@
+"""
+Asyncio serving mode for the DermaCare backend.
+
+Run with:
+    uvicorn asgi_app:asgi_app --host 0.0.0.0 --port 5000
+
+The hot, I/O-bound routes (/predict, /profile, GET /history, GET /chat/history
+and /auth/google) are served natively on the event loop with Motor for
+MongoDB. CPU-bound preprocessing and inference run on a dedicated executor,
+Google token verification on its own small executor, and every resource is
+guarded by its own semaphore, so thousands of idle or slow connections cost
+only a coroutine each. All other routes fall through to the Flask app, which
+shares the model, caches and scheduler loaded by app.py.
+"""
+import asyncio
+import datetime
+import os
+import time
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from a2wsgi import WSGIMiddleware
+from bson.objectid import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+import jwt
+
+import app as flask_backend
+from pagination import paginate_async, parse_page_size, InvalidCursor
+from metrics import MongoCommandMetrics
+from chat_store import assemble_messages, is_legacy, message_count
+from admission import Overloaded, DeadlineExceeded, deadline_from_header
+
+
+# --- EXECUTORS AND CONCURRENCY LIMITS ---
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASYNC_INFERENCE_THREADS', '8')),
+    thread_name_prefix='async-inference'
+)
+google_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASYNC_GOOGLE_THREADS', '4')),
+    thread_name_prefix='async-google'
+)
+
+CONCURRENCY_LIMITS = {
+    'inference': int(os.environ.get('ASYNC_INFERENCE_CONCURRENCY', '32')),
+    'mongo': int(os.environ.get('ASYNC_MONGO_CONCURRENCY', '100')),
+    'google': int(os.environ.get('ASYNC_GOOGLE_CONCURRENCY', '8')),
+}
+# Semaphores are created lazily so they bind to the server's event loop
+_semaphores = {}
+
+def limit(resource):
+    if resource not in _semaphores:
+        _semaphores[resource] = asyncio.Semaphore(CONCURRENCY_LIMITS[resource])
+    return _semaphores[resource]
+
+async def run_in(executor, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+# --- MONGODB (MOTOR) ---
+motor_client = AsyncIOMotorClient(
+    flask_backend.app.config['MONGO_URI'],
+    event_listeners=[MongoCommandMetrics(flask_backend.MONGO_LATENCY)]
+)
+db = motor_client.get_default_database()
+users = db.users
+predictions = db.predictions
+chat_history = db.chat_history
+chat_message_buckets = db.chat_message_buckets
+
+
+# --- AUTH ---
+def error(message, status, key='message'):
+    return JSONResponse({key: message}, status_code=status)
+
+async def resolve_user(email):
+    user = flask_backend.user_cache.get(email)
+    if user is None:
+        async with limit('mongo'):
+            user = await users.find_one({'email': email})
+        if user is not None:
+            flask_backend.user_cache.put(email, user)
+    return dict(user) if user is not None else None
+
+def token_required(handler):
+    async def wrapper(request):
+        auth_header = request.headers.get('Authorization', '')
+        parts = auth_header.split(' ')
+        token = parts[1] if len(parts) > 1 else None
+        if not token:
+            return error('Token is missing!', 401)
+        try:
+            data = flask_backend.token_cache.verify(token, flask_backend.decode_token)
+            current_user = await resolve_user(data['email'])
+        except Exception:
+            return error('Token is invalid!', 401)
+        return await handler(request, current_user)
+    return wrapper
+
+
+# --- METRICS ---
+def timed(route, handler):
+    """Records native route latency in the same histogram the Flask routes use."""
+    async def wrapper(request):
+        started = time.perf_counter()
+        status = '500'
+        try:
+            response = await handler(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            flask_backend.HTTP_LATENCY.observe(
+                time.perf_counter() - started, method=request.method, route=route, status=status
+            )
+    return wrapper
+
+
+# --- ROUTES ---
+async def predict(request):
+    form = await request.form()
+    upload = form.get('image')
+    if upload is None or not hasattr(upload, 'read'):
+        return error('No image file provided', 400, key='error')
+    if upload.filename == '':
+        return error('No selected file', 400, key='error')
+    if not flask_backend.allowed_file(upload.filename):
+        return error('File type not allowed', 400, key='error')
+
+    image_bytes = await upload.read()
+    if flask_backend.PERSIST_PREDICT_UPLOADS:
+        flask_backend.persist_upload_async(image_bytes, upload.filename)
+    try:
+        deadline = deadline_from_header(request.headers.get(flask_backend.DEADLINE_HEADER))
+        async with limit('inference'):
+            if request.query_params.get('embedding', 'false').lower() == 'true':
+                result, embedding = await run_in(
+                    inference_executor, flask_backend.embed_from_bytes, image_bytes, deadline
+                )
+                if embedding is not None:
+                    result['embedding'] = embedding.tolist()
+            else:
+                result = await run_in(
+                    inference_executor, flask_backend.predict_from_bytes, image_bytes, None, deadline
+                )
+        return JSONResponse(result)
+    except flask_backend.ModelNotReady as e:
+        return JSONResponse({'error': str(e)}, status_code=503, headers={'Retry-After': '5'})
+    except Overloaded as e:
+        return JSONResponse({'error': str(e)}, status_code=503, headers={'Retry-After': str(e.retry_after)})
+    except (DeadlineExceeded, asyncio.TimeoutError, FutureTimeoutError):
+        return error('Deadline exceeded', 504, key='error')
+    except ValueError as e:
+        return error(str(e), 400, key='error')
+    except Exception as e:
+        return error(str(e), 500, key='error')
+
+@token_required
+async def profile(request, current_user):
+    return JSONResponse({'user': {
+        'username': current_user['username'],
+        'email': current_user['email'],
+        'created_at': str(current_user['created_at'])
+    }})
+
+@token_required
+async def fetch_prediction_history(request, current_user):
+    args = request.query_params
+    try:
+        embed_images = args.get('embed_images', 'false').lower() == 'true'
+        full_images = args.get('full_images', 'false').lower() == 'true'
+        thumb_size = int(args.get('thumb_size', flask_backend.DEFAULT_THUMBNAIL_SIZE))
+        page_size = parse_page_size(args.get('limit'), default=100)
+        fields = flask_backend.parse_fields(args.get('fields'), flask_backend.HISTORY_FIELDS)
+
+        async with limit('mongo'):
+            items, next_cursor = await paginate_async(
+                predictions,
+                {'user_email': current_user['email']},
+                flask_backend.prediction_history_projection(fields, embed_images, full_images),
+                limit=page_size,
+                cursor=args.get('cursor')
+            )
+
+        def serialize():
+            image_url_for = lambda blob_id: f'/history/images/{blob_id}'
+            return [
+                flask_backend.serialize_prediction_item(
+                    it, fields, embed_images, full_images, thumb_size, image_url_for
+                )
+                for it in items
+            ]
+
+        # Embedding images reads blobs synchronously, so keep it off the loop
+        history = await run_in(inference_executor, serialize) if embed_images else serialize()
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else None
+        return JSONResponse(history, headers=headers)
+    except (InvalidCursor, ValueError) as e:
+        return error(str(e), 400)
+    except Exception as e:
+        return error(f'Error fetching history: {str(e)}', 500)
+
+@token_required
+async def list_chat_history(request, current_user):
+    async with limit('mongo'):
+        chats = await (
+            chat_history.find({'user_email': current_user['email']}, {'title': 1, 'timestamp': 1})
+            .sort('timestamp', -1)
+            .to_list(length=None)
+        )
+    history = []
+    for chat in chats:
+        timestamp = chat.get('timestamp')
+        if isinstance(timestamp, datetime.datetime):
+            timestamp = timestamp.isoformat()
+        history.append({'id': str(chat['_id']), 'title': chat.get('title'), 'timestamp': timestamp})
+    return JSONResponse(history)
+
+@token_required
+async def get_chat_history(request, current_user):
+    try:
+        obj_id = ObjectId(request.path_params['chat_id'])
+    except Exception:
+        return error('Invalid chat ID format', 400)
+    async with limit('mongo'):
+        chat_session = await chat_history.find_one({'_id': obj_id, 'user_email': current_user['email']})
+        if (chat_session and not is_legacy(chat_session)
+                and message_count(chat_session) > flask_backend.chat_store.inline_limit):
+            bucket_docs = await chat_message_buckets.find({'chat_id': obj_id}).to_list(length=None)
+        else:
+            bucket_docs = []
+    if not chat_session:
+        return error('Chat session not found or access denied', 404)
+    chat_session['messages'] = assemble_messages(chat_session, bucket_docs, flask_backend.chat_store.inline_limit)
+    chat_session['message_count'] = len(chat_session['messages'])
+    if isinstance(chat_session.get('timestamp'), datetime.datetime):
+        chat_session['timestamp'] = chat_session['timestamp'].isoformat()
+    chat_session['_id'] = str(chat_session['_id'])
+    return JSONResponse(chat_session)
+
+async def google_auth(request):
+    try:
+        data = await request.json()
+        id_token_str = data.get('idToken')
+        if not id_token_str:
+            return error('ID token is required', 400)
+
+        try:
+            async with limit('google'):
+                idinfo = await run_in(
+                    google_executor,
+                    flask_backend.google_verifier.verify,
+                    id_token_str
+                )
+        except ValueError:
+            return error('Invalid Google token', 401)
+
+        email = idinfo['email']
+        name = idinfo.get('name', '')
+        picture = idinfo.get('picture', '')
+        now = datetime.datetime.utcnow()
+
+        async with limit('mongo'):
+            user = await users.find_one({'email': email})
+            if not user:
+                user = {
+                    'username': name,
+                    'email': email,
+                    'google_id': idinfo['sub'],
+                    'profile_picture': picture,
+                    'auth_provider': 'google',
+                    'created_at': now
+                }
+                await users.insert_one(user)
+            else:
+                await users.update_one(
+                    {'email': email},
+                    {'$set': {'username': name, 'profile_picture': picture, 'last_login': now}}
+                )
+        flask_backend.user_cache.invalidate(email)
+
+        token = jwt.encode({
+            'email': email,
+            'exp': now + datetime.timedelta(hours=24)
+        }, flask_backend.app.config['SECRET_KEY'], algorithm="HS256")
+        return JSONResponse({'token': token, 'user': {
+            'username': user.get('username'),
+            'email': user.get('email'),
+            'profile_picture': user.get('profile_picture')
+        }})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    if flask_backend.write_behind is not None:
+        # Drain queued history records before the process exits
+        await asyncio.get_running_loop().run_in_executor(None, flask_backend.write_behind.shutdown)
+    inference_executor.shutdown(wait=False)
+    google_executor.shutdown(wait=False)
+    motor_client.close()
+
+
+asgi_app = Starlette(
+    routes=[
+        Route('/predict', timed('/predict', predict), methods=['POST']),
+        Route('/profile', timed('/profile', profile), methods=['GET']),
+        Route('/history', timed('/history', fetch_prediction_history), methods=['GET']),
+        Route('/chat/history', timed('/chat/history', list_chat_history), methods=['GET']),
+        Route('/chat/history/{chat_id}', timed('/chat/history/<chat_id>', get_chat_history), methods=['GET']),
+        Route('/auth/google', timed('/auth/google', google_auth), methods=['POST']),
+        # Everything else is served by the synchronous Flask app on a thread pool
+        Mount('/', app=WSGIMiddleware(flask_backend.app)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
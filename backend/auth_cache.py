@@ -0,0 +1,100 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+# --- BOUNDED TTL CACHE ---
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl_seconds` (or their own deadline)."""
+
+    def __init__(self, max_entries=10000, ttl_seconds=60):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, expires_at=None):
+        deadline = time.time() + self.ttl
+        if expires_at is not None:
+            deadline = min(deadline, expires_at)
+        with self._lock:
+            self._entries[key] = (deadline, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# --- AUTH CACHES ---
+class UserCache(TTLCache):
+    """User documents keyed by email; call invalidate(email) whenever a user is written."""
+
+    def resolve(self, email, loader):
+        user = self.get(email)
+        if user is None:
+            user = loader(email)
+            if user is not None:
+                self.put(email, user)
+        # Handlers get their own copy so they cannot mutate the cached document
+        return dict(user) if user is not None else None
+
+
+class VerifiedTokenCache(TTLCache):
+    """
+    Payloads of JWTs whose signature was already verified. Entries never outlive
+    the token's own 'exp' claim, and tokens are keyed by their SHA-256.
+    """
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def verify(self, token, decoder):
+        key = self._key(token)
+        payload = self.get(key)
+        if payload is None:
+            payload = decoder(token)
+            self.put(key, payload, expires_at=payload.get('exp'))
+        return payload
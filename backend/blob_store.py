@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+
+
+# --- CONTENT-ADDRESSED BLOB STORES ---
+# Blobs are addressed by the SHA-256 of their bytes, so identical images are
+# stored once and a blob id never changes meaning (safe to cache forever).
+
+def blob_id_for(data):
+    return hashlib.sha256(data).hexdigest()
+
+def is_valid_blob_id(blob_id):
+    return isinstance(blob_id, str) and len(blob_id) == 64 and all(c in '0123456789abcdef' for c in blob_id)
+
+
+class LocalBlobStore:
+    """Filesystem store: <root>/<ab>/<cd>/<sha256> plus a small JSON sidecar for metadata."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, blob_id):
+        return os.path.join(self.root, blob_id[:2], blob_id[2:4], blob_id)
+
+    def put(self, data, content_type='application/octet-stream'):
+        blob_id = blob_id_for(data)
+        path = self._path(blob_id)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with open(path + '.json', 'w') as f:
+                json.dump({'content_type': content_type, 'length': len(data)}, f)
+        return blob_id
+
+    def get(self, blob_id):
+        """Returns (bytes, content_type), or None if the blob does not exist."""
+        if not is_valid_blob_id(blob_id):
+            return None
+        path = self._path(blob_id)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        content_type = 'application/octet-stream'
+        try:
+            with open(path + '.json', 'r') as f:
+                content_type = json.load(f).get('content_type', content_type)
+        except (OSError, ValueError):
+            pass
+        return data, content_type
+
+    def exists(self, blob_id):
+        return is_valid_blob_id(blob_id) and os.path.exists(self._path(blob_id))
+
+    def delete(self, blob_id):
+        if not is_valid_blob_id(blob_id):
+            return
+        for path in (self._path(blob_id), self._path(blob_id) + '.json'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class GridFSBlobStore:
+    """MongoDB GridFS store; the SHA-256 is used as the GridFS filename."""
+
+    def __init__(self, db, bucket_name='prediction_images'):
+        import gridfs
+        self._gridfs = gridfs
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name)
+        self.files = db[f'{bucket_name}.files']
+        self._indexed = False
+
+    def _ensure_index(self):
+        # Created on the first write rather than in __init__, so constructing
+        # the store never needs a reachable MongoDB
+        if not self._indexed:
+            self.files.create_index('filename', unique=True)
+            self._indexed = True
+
+    def put(self, data, content_type='application/octet-stream'):
+        blob_id = blob_id_for(data)
+        self._ensure_index()
+        if self.files.find_one({'filename': blob_id}, {'_id': 1}) is None:
+            try:
+                self.bucket.upload_from_stream(
+                    blob_id,
+                    data,
+                    metadata={'content_type': content_type, 'length': len(data)}
+                )
+            except Exception:
+                # Another request stored the same bytes first (unique filename index)
+                if self.files.find_one({'filename': blob_id}, {'_id': 1}) is None:
+                    raise
+        return blob_id
+
+    def get(self, blob_id):
+        if not is_valid_blob_id(blob_id):
+            return None
+        try:
+            stream = self.bucket.open_download_stream_by_name(blob_id)
+        except self._gridfs.errors.NoFile:
+            return None
+        content_type = (stream.metadata or {}).get('content_type', 'application/octet-stream')
+        return stream.read(), content_type
+
+    def exists(self, blob_id):
+        return is_valid_blob_id(blob_id) and self.files.find_one({'filename': blob_id}, {'_id': 1}) is not None
+
+    def delete(self, blob_id):
+        if not is_valid_blob_id(blob_id):
+            return
+        for doc in self.files.find({'filename': blob_id}, {'_id': 1}):
+            self.bucket.delete(doc['_id'])
+
+
+def create_blob_store(kind, db=None, root='blobs', bucket_name='prediction_images'):
+    """Builds the configured store: 'gridfs' (needs db) or 'local'."""
+    if kind == 'gridfs':
+        return GridFSBlobStore(db, bucket_name=bucket_name)
+    if kind == 'local':
+        return LocalBlobStore(root)
+    raise ValueError(f"Unknown blob store '{kind}'. Expected 'gridfs' or 'local'")
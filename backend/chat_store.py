@@ -0,0 +1,205 @@
+import datetime
+from datetime import timezone
+
+
+# --- INCREMENTAL CHAT HISTORY ---
+# A chat is a head document in `chat_history` holding the title, timestamp,
+# `message_count` and the first `inline_limit` messages. Clients append only
+# their new messages together with `base_seq` (how many messages they know
+# the server already has); the write is a conditional $push, so a stale or
+# replayed delta is rejected instead of duplicating messages. Messages past
+# `inline_limit` go to fixed-size documents in `chat_message_buckets`, so no
+# single document grows without bound. Head documents written before
+# `message_count` existed hold all their messages inline, however many; the
+# first append to one holding more than `inline_limit` moves the excess into
+# buckets.
+
+DEFAULT_INLINE_LIMIT = 500
+DEFAULT_BUCKET_SIZE = 200
+
+
+class ChatConflict(Exception):
+    """The client's base_seq does not match the server; carries the server's message_count."""
+
+    def __init__(self, message_count):
+        super().__init__(f'Chat has {message_count} messages')
+        self.message_count = message_count
+
+
+def chat_title(messages):
+    return messages[0].get('text', 'Untitled Chat') if messages else 'Untitled Chat'
+
+def message_count(head):
+    return head.get('message_count', len(head.get('messages') or []))
+
+def is_legacy(head):
+    """Written before message_count: every message is inline, none in buckets."""
+    return 'message_count' not in head
+
+def assemble_messages(head, bucket_docs, inline_limit=DEFAULT_INLINE_LIMIT):
+    """Joins the inline messages and the overflow buckets of a chat, in sequence order."""
+    if is_legacy(head):
+        return list(head.get('messages') or [])
+    count = message_count(head)
+    messages = list((head.get('messages') or [])[:min(count, inline_limit)])
+    overflow = {}
+    for bucket in sorted(bucket_docs, key=lambda b: b['bucket']):
+        for entry in bucket.get('messages', []):
+            # Entries past message_count come from an append that was rolled
+            # back; a later retry of the same seq overwrites earlier copies
+            if inline_limit <= entry['seq'] < count:
+                overflow[entry['seq']] = entry['message']
+    messages.extend(overflow[seq] for seq in sorted(overflow))
+    return messages
+
+
+class ChatStore:
+    def __init__(self, chats, buckets, inline_limit=DEFAULT_INLINE_LIMIT, bucket_size=DEFAULT_BUCKET_SIZE):
+        self.chats = chats
+        self.buckets = buckets
+        self.inline_limit = max(1, int(inline_limit))
+        self.bucket_size = max(1, int(bucket_size))
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now(timezone.utc).isoformat()
+
+    def _split(self, base_seq, messages):
+        """(messages that fit inline, {bucket number: [{'seq', 'message'}, ...]})"""
+        inline, overflow = [], {}
+        for seq, message in enumerate(messages, start=base_seq):
+            if seq < self.inline_limit:
+                inline.append(message)
+            else:
+                bucket = (seq - self.inline_limit) // self.bucket_size
+                overflow.setdefault(bucket, []).append({'seq': seq, 'message': message})
+        return inline, overflow
+
+    def _write_overflow(self, chat_id, user_email, overflow):
+        for bucket, entries in sorted(overflow.items()):
+            self.buckets.update_one(
+                {'chat_id': chat_id, 'bucket': bucket},
+                {'$push': {'messages': {'$each': entries}}, '$setOnInsert': {'user_email': user_email}},
+                upsert=True
+            )
+
+    def _head_at(self, chat_id, user_email, seq):
+        branches = [{'message_count': seq}]
+        if seq <= self.inline_limit:
+            # Larger legacy heads are migrated first (see _migrate_legacy)
+            branches.append({'message_count': {'$exists': False}, 'messages': {'$size': seq}})
+        return {'_id': chat_id, 'user_email': user_email, '$or': branches}
+
+    def _migrate_legacy(self, chat_id, user_email, head):
+        """Moves the messages of a legacy head past inline_limit into buckets."""
+        messages = head.get('messages') or []
+        _, overflow = self._split(0, messages)
+        # Repeating this after a failure only adds duplicate seqs, which reads collapse
+        self._write_overflow(chat_id, user_email, overflow)
+        self.chats.update_one(
+            {'_id': chat_id, 'message_count': {'$exists': False}, 'messages': {'$size': len(messages)}},
+            {
+                '$set': {'message_count': len(messages)},
+                '$push': {'messages': {'$each': [], '$slice': self.inline_limit}},
+            }
+        )
+
+    # --- WRITES ---
+    def create(self, user_email, messages):
+        inline, overflow = self._split(0, messages)
+        result = self.chats.insert_one({
+            'user_email': user_email,
+            'title': chat_title(messages),
+            'messages': inline,
+            'message_count': len(messages),
+            'timestamp': self._now(),
+        })
+        try:
+            self._write_overflow(result.inserted_id, user_email, overflow)
+        except Exception:
+            self.chats.delete_one({'_id': result.inserted_id})
+            self.buckets.delete_many({'chat_id': result.inserted_id})
+            raise
+        return result.inserted_id
+
+    def append(self, chat_id, user_email, base_seq, messages):
+        """
+        Appends `messages` after the first `base_seq` messages and returns the
+        new message_count. Raises ChatConflict when the chat does not have
+        exactly `base_seq` messages, LookupError when it does not exist.
+        """
+        new_count = base_seq + len(messages)
+        inline, overflow = self._split(base_seq, messages)
+        update = {'$set': {'message_count': new_count, 'timestamp': self._now()}}
+        if base_seq == 0:
+            update['$set']['title'] = chat_title(messages)
+        if inline:
+            update['$push'] = {'messages': {'$each': inline}}
+
+        result = self.chats.update_one(self._head_at(chat_id, user_email, base_seq), update)
+        if result.matched_count == 0:
+            head = self.chats.find_one(
+                {'_id': chat_id, 'user_email': user_email}, {'message_count': 1, 'messages': 1}
+            )
+            if head is None:
+                raise LookupError('Chat not found or access denied')
+            if is_legacy(head) and len(head.get('messages') or []) > self.inline_limit:
+                self._migrate_legacy(chat_id, user_email, head)
+                result = self.chats.update_one(self._head_at(chat_id, user_email, base_seq), update)
+            if result.matched_count == 0:
+                raise ChatConflict(message_count(head))
+
+        try:
+            self._write_overflow(chat_id, user_email, overflow)
+        except Exception:
+            # Hand the sequence numbers back so the client can retry the same delta
+            self.chats.update_one(
+                {'_id': chat_id, 'message_count': new_count},
+                {
+                    '$set': {'message_count': base_seq},
+                    '$push': {'messages': {'$each': [], '$slice': min(base_seq, self.inline_limit)}},
+                }
+            )
+            raise
+        return new_count
+
+    def replace(self, chat_id, user_email, messages):
+        """Full rewrite, for clients that edited or truncated a conversation."""
+        inline, overflow = self._split(0, messages)
+        result = self.chats.update_one(
+            {'_id': chat_id, 'user_email': user_email},
+            {'$set': {
+                'messages': inline,
+                'message_count': len(messages),
+                'title': chat_title(messages),
+                'timestamp': self._now(),
+            }}
+        )
+        if result.matched_count == 0:
+            raise LookupError('Chat not found or access denied')
+        self.buckets.delete_many({'chat_id': chat_id})
+        self._write_overflow(chat_id, user_email, overflow)
+        return len(messages)
+
+    def delete(self, user_email, chat_ids):
+        result = self.chats.delete_many({'_id': {'$in': chat_ids}, 'user_email': user_email})
+        self.buckets.delete_many({'chat_id': {'$in': chat_ids}, 'user_email': user_email})
+        return result.deleted_count
+
+    # --- READS ---
+    def load(self, chat_id, user_email):
+        head = self.chats.find_one({'_id': chat_id, 'user_email': user_email})
+        if head is None:
+            return None
+        bucket_docs = []
+        if not is_legacy(head) and message_count(head) > self.inline_limit:
+            bucket_docs = list(self.buckets.find({'chat_id': chat_id}))
+        head['messages'] = assemble_messages(head, bucket_docs, self.inline_limit)
+        head['message_count'] = len(head['messages'])
+        return head
+
+    def list(self, user_email):
+        """Chat summaries only: the messages never leave the database."""
+        return self.chats.find(
+            {'user_email': user_email}, {'title': 1, 'timestamp': 1}
+        ).sort('timestamp', -1)
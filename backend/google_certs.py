@@ -0,0 +1,105 @@
+import logging
+import re
+import threading
+import time
+
+import jwt
+import requests
+from requests.adapters import HTTPAdapter
+from google.auth import jwt as google_jwt
+
+
+# --- GOOGLE ID TOKEN VERIFICATION ---
+# verify_oauth2_token(token, google_requests.Request(), ...) downloads Google's
+# signing certificates on every call. This verifier keeps them in memory for
+# as long as the response's Cache-Control max-age allows, fetches them over a
+# pooled session, and refreshes early only when a token names an unknown key
+# id (key rotation). `certs_url` can point at a local stand-in server in tests.
+
+GOOGLE_CERTS_URL = 'https://www.googleapis.com/oauth2/v1/certs'
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+def cache_lifetime(headers, default_ttl):
+    """Seconds a certificate response may be reused, from Cache-Control and Age."""
+    cache_control = headers.get('Cache-Control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    if not match:
+        return float(default_ttl)
+    try:
+        age = float(headers.get('Age', 0))
+    except ValueError:
+        age = 0.0
+    return max(0.0, float(match.group(1)) - age)
+
+
+class GoogleTokenVerifier:
+    def __init__(self, client_id, certs_url=GOOGLE_CERTS_URL, default_ttl=3600, timeout=5, pool_size=4):
+        self.client_id = client_id
+        self.certs_url = certs_url
+        self.default_ttl = float(default_ttl)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._certs = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.hits = 0
+
+    def _fetch(self):
+        response = self.session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+        certs = response.json()
+        self.fetches += 1
+        return certs, time.monotonic() + cache_lifetime(response.headers, self.default_ttl)
+
+    def certs(self, force_refresh=False):
+        """Current signing certificates ({key id: PEM}), fetched at most once per lifetime."""
+        with self._lock:
+            if not force_refresh and self._certs is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return self._certs
+            try:
+                self._certs, self._expires_at = self._fetch()
+            except (requests.RequestException, ValueError) as e:
+                if self._certs is None:
+                    raise ValueError(f'Could not fetch Google certificates: {e}')
+                # Keep serving the last good set; retry on the next call
+                logger.warning("Google certificate refresh failed, using cached set: %s", e)
+            return self._certs
+
+    def verify(self, token, clock_skew_in_seconds=10):
+        """Equivalent of id_token.verify_oauth2_token; raises ValueError on an invalid token."""
+        try:
+            key_id = jwt.get_unverified_header(token).get('kid')
+        except jwt.PyJWTError as e:
+            raise ValueError(f'Malformed token: {e}')
+        certs = self.certs()
+        if key_id is not None and key_id not in certs:
+            # Google rotated its keys before our cached set expired
+            certs = self.certs(force_refresh=True)
+        idinfo = google_jwt.decode(
+            token, certs=certs, audience=self.client_id, clock_skew_in_seconds=clock_skew_in_seconds
+        )
+        if idinfo.get('iss') not in GOOGLE_ISSUERS:
+            raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+        return idinfo
+
+    def stats(self):
+        with self._lock:
+            return {
+                'certs_url': self.certs_url,
+                'fetches': self.fetches,
+                'hits': self.hits,
+                'cached_keys': len(self._certs or {}),
+                'expires_in_seconds': max(0.0, self._expires_at - time.monotonic()),
+            }
@@ -0,0 +1,91 @@
+"""
+Moves base64 images embedded in `predictions` documents into the blob store.
+
+Each batch stores the decoded images, then replaces `image_base64` with an
+`image_blob_id` reference. Documents are only updated after their blob is
+written, so the migration can be interrupted and re-run safely.
+
+Usage:
+    MONGO_URI=mongodb+srv://... python migrate_prediction_images.py --store gridfs
+    python migrate_prediction_images.py --mongo-uri mongodb://localhost/Cluster0 --store local --dir blobs
+"""
+import argparse
+import base64
+import os
+import sys
+import time
+
+from pymongo import MongoClient, UpdateOne
+
+from blob_store import create_blob_store
+
+
+def migrate(db, store, batch_size=100, dry_run=False):
+    predictions = db.predictions
+    query = {'image_base64': {'$exists': True}, 'image_blob_id': {'$exists': False}}
+    migrated = failed = 0
+    last_id = None
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query['_id'] = {'$gt': last_id}
+        batch = list(
+            predictions.find(batch_query, {'image_base64': 1, 'image_mime': 1})
+            .sort('_id', 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+
+        updates = []
+        for doc in batch:
+            try:
+                data = base64.b64decode(doc['image_base64'])
+            except Exception as e:
+                print(f"[ERROR] {doc['_id']}: could not decode base64 ({e})")
+                failed += 1
+                continue
+            if dry_run:
+                migrated += 1
+                continue
+            blob_id = store.put(data, doc.get('image_mime', 'image/jpeg'))
+            updates.append(UpdateOne(
+                {'_id': doc['_id']},
+                {'$set': {'image_blob_id': blob_id, 'image_size': len(data)},
+                 '$unset': {'image_base64': ''}}
+            ))
+
+        if updates:
+            predictions.bulk_write(updates, ordered=False)
+        migrated += len(updates)
+        print(f"[LOG] Migrated {migrated} documents ({failed} failed) ...")
+    return migrated, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move prediction images from MongoDB documents to the blob store.")
+    parser.add_argument('--mongo-uri', default=os.environ.get('MONGO_URI'))
+    parser.add_argument('--database', default=None, help='Defaults to the database in the URI')
+    parser.add_argument('--store', choices=['gridfs', 'local'], default=os.environ.get('BLOB_STORE', 'gridfs'))
+    parser.add_argument('--dir', default=os.environ.get('BLOB_STORE_DIR', 'blobs'))
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not args.mongo_uri:
+        print("[ERROR] Pass --mongo-uri or set MONGO_URI.")
+        return 2
+
+    client = MongoClient(args.mongo_uri)
+    db = client[args.database] if args.database else client.get_default_database()
+    store = create_blob_store(args.store, db=db, root=args.dir)
+
+    started = time.perf_counter()
+    migrated, failed = migrate(db, store, batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"[SUCCESS] Migrated {migrated} documents in {time.perf_counter() - started:.1f}s ({failed} failed).")
+    return 0 if failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import base64
+import datetime
+
+from bson.objectid import ObjectId
+
+
+# --- KEYSET (CURSOR) PAGINATION ---
+# Pages are ordered by (created_at desc, _id desc). The cursor is the
+# (created_at, _id) of the last item on a page, so the next page is a range
+# scan on the {user_email, created_at, _id} index instead of a skip/sort.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, object_id):
+    raw = f"{created_at.isoformat()}|{object_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        created_at, object_id = raw.split('|', 1)
+        return datetime.datetime.fromisoformat(created_at), ObjectId(object_id)
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def keyset_query(query, cursor, sort_field='created_at'):
+    """Adds the 'strictly after the cursor' condition to a query."""
+    query = dict(query)
+    if cursor:
+        created_at, object_id = decode_cursor(cursor)
+        query['$or'] = [
+            {sort_field: {'$lt': created_at}},
+            {sort_field: created_at, '_id': {'$lt': object_id}},
+        ]
+    return query
+
+def split_page(docs, limit, sort_field='created_at'):
+    """Trims the look-ahead document and builds the cursor for the next page."""
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last[sort_field], last['_id'])
+    return docs, next_cursor
+
+def paginate(collection, query, projection=None, limit=DEFAULT_PAGE_SIZE, cursor=None, sort_field='created_at'):
+    """
+    Returns (documents, next_cursor). next_cursor is None on the last page.
+    One extra document is fetched to know whether another page exists.
+    """
+    docs = list(
+        collection.find(keyset_query(query, cursor, sort_field), projection)
+        .sort([(sort_field, -1), ('_id', -1)])
+        .limit(limit + 1)
+    )
+    return split_page(docs, limit, sort_field)
+
+async def paginate_async(collection, query, projection=None, limit=DEFAULT_PAGE_SIZE, cursor=None, sort_field='created_at'):
+    """paginate() for Motor collections."""
+    docs = await (
+        collection.find(keyset_query(query, cursor, sort_field), projection)
+        .sort([(sort_field, -1), ('_id', -1)])
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
+    )
+    return split_page(docs, limit, sort_field)
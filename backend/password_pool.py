@@ -0,0 +1,47 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from admission import Overloaded
+
+
+# --- PASSWORD HASHING OFF THE REQUEST THREADS ---
+# scrypt hashing is deliberately CPU-heavy. Running it in a small process pool
+# caps how many cores login/register can take, and a bounded number of
+# pending jobs turns a login storm into fast 503s instead of a backlog that
+# starves /predict.
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_pending=32):
+        self.workers = max(1, int(workers))
+        self._slots = threading.BoundedSemaphore(max(1, int(max_pending)))
+        # Fork like the inference worker pool; start() runs before other threads exist
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('fork')
+        )
+
+    def start(self):
+        """Forks the worker processes now rather than on the first login."""
+        for future in [self._executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def _run(self, fn, *args):
+        # Never wait for a slot: a request thread parked here is as bad as the backlog
+        if not self._slots.acquire(blocking=False):
+            raise Overloaded('Too many authentication requests, retry later', retry_after=1)
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def check(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
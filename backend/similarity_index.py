@@ -0,0 +1,114 @@
+import threading
+
+import numpy as np
+
+
+# --- SIMILAR-CASE SEARCH ---
+# Prediction embeddings are L2-normalised and kept in one growable float32
+# matrix per partition (per user, or a single shared one), so a query is a
+# single matrix-vector product plus argpartition for the top k: cosine
+# similarity over the whole partition without a Python-level loop. Rows are
+# only ever appended; a search works on a snapshot of the first n rows, so
+# adds never block behind a running query for long. The index holds
+# embeddings of one model version; reset() starts over for a new one.
+
+class _Partition:
+    __slots__ = ('vectors', 'ids', 'owners')
+
+    def __init__(self, dim, capacity):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.ids = []
+        self.owners = []
+
+    def append(self, vector, item_id, owner):
+        n = len(self.ids)
+        if n == self.vectors.shape[0]:
+            grown = np.empty((n * 2, self.vectors.shape[1]), dtype=np.float32)
+            grown[:n] = self.vectors
+            self.vectors = grown
+        self.vectors[n] = vector
+        self.ids.append(item_id)
+        self.owners.append(owner)
+
+
+def normalise(vector, dim):
+    vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+    if vector.shape[0] != dim:
+        raise ValueError(f'Expected a {dim}-d embedding, got {vector.shape[0]}')
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class SimilarityIndex:
+    def __init__(self, dim=512, per_user=True, initial_capacity=1024):
+        self.dim = int(dim)
+        self.per_user = per_user
+        self.initial_capacity = max(1, int(initial_capacity))
+        self.model_version = None
+        self._partitions = {}
+        self._known = set()
+        self._lock = threading.Lock()
+        self.searches = 0
+
+    def _key(self, owner):
+        return owner if self.per_user else None
+
+    def reset(self, model_version):
+        """Drops every embedding and only accepts ones from `model_version` from now on."""
+        with self._lock:
+            self.model_version = model_version
+            self._partitions = {}
+            self._known = set()
+
+    def add(self, item_id, vector, owner, model_version):
+        """Adds one embedding; False if it is from another model version or already indexed."""
+        vector = normalise(vector, self.dim)
+        with self._lock:
+            if model_version != self.model_version or item_id in self._known:
+                return False
+            key = self._key(owner)
+            partition = self._partitions.get(key)
+            if partition is None:
+                capacity = self.initial_capacity if key is None else min(self.initial_capacity, 64)
+                partition = self._partitions[key] = _Partition(self.dim, capacity)
+            partition.append(vector, item_id, owner)
+            self._known.add(item_id)
+            return True
+
+    def search(self, vector, owner, k=5, exclude=()):
+        """Up to k (item_id, owner, cosine similarity) tuples, most similar first."""
+        query = normalise(vector, self.dim)
+        with self._lock:
+            partition = self._partitions.get(self._key(owner))
+            if partition is None:
+                return []
+            n = len(partition.ids)
+            vectors, ids, owners = partition.vectors[:n], partition.ids, partition.owners
+            self.searches += 1
+
+        wanted = min(n, k + len(exclude))
+        if wanted <= 0:
+            return []
+        scores = vectors @ query
+        top = np.argpartition(-scores, wanted - 1)[:wanted]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for row in top:
+            if ids[row] in exclude:
+                continue
+            results.append((ids[row], owners[row], float(scores[row])))
+            if len(results) == k:
+                break
+        return results
+
+    def stats(self):
+        with self._lock:
+            sizes = [len(p.ids) for p in self._partitions.values()]
+            return {
+                'model_version': self.model_version,
+                'per_user': self.per_user,
+                'partitions': len(sizes),
+                'embeddings': sum(sizes),
+                'largest_partition': max(sizes, default=0),
+                'memory_bytes': sum(p.vectors.nbytes for p in self._partitions.values()),
+                'searches': self.searches,
+            }
@@ -0,0 +1,139 @@
+import copy
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from chat_store import ChatConflict, ChatStore
+
+
+class FakeCollection:
+    """The subset of a PyMongo collection ChatStore uses, in memory."""
+
+    def __init__(self):
+        self.docs = []
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def _matches_value(value, condition):
+        if isinstance(condition, dict) and any(k.startswith('$') for k in condition):
+            for op, arg in condition.items():
+                if op == '$exists' and (value is not None) != arg:
+                    return False
+                if op == '$size' and (not isinstance(value, list) or len(value) != arg):
+                    return False
+                if op == '$in' and value not in arg:
+                    return False
+            return True
+        return value == condition
+
+    def _matches(self, doc, query):
+        for key, condition in query.items():
+            if key == '$or':
+                if not any(self._matches(doc, branch) for branch in condition):
+                    return False
+            elif not self._matches_value(doc.get(key), condition):
+                return False
+        return True
+
+    def _apply(self, doc, update):
+        for key, value in update.get('$set', {}).items():
+            doc[key] = value
+        for key, value in update.get('$push', {}).items():
+            target = doc.setdefault(key, [])
+            if isinstance(value, dict) and '$each' in value:
+                target.extend(copy.deepcopy(value['$each']))
+                if '$slice' in value:
+                    del target[value['$slice']:]
+            else:
+                target.append(copy.deepcopy(value))
+
+    def insert_one(self, doc):
+        doc = copy.deepcopy(doc)
+        doc.setdefault('_id', next(self._ids))
+        self.docs.append(doc)
+        return SimpleNamespace(inserted_id=doc['_id'])
+
+    def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    def find(self, query, projection=None):
+        return [copy.deepcopy(doc) for doc in self.docs if self._matches(doc, query)]
+
+    def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if self._matches(doc, query):
+                self._apply(doc, update)
+                return SimpleNamespace(matched_count=1)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith('$')}
+            doc.update(update.get('$setOnInsert', {}))
+            self._apply(doc, update)
+            self.insert_one(doc)
+        return SimpleNamespace(matched_count=0)
+
+    def delete_one(self, query):
+        self.delete_many(query)
+
+    def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if not self._matches(doc, query)]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+
+def message(i):
+    return {'text': str(i)}
+
+
+@pytest.fixture
+def store():
+    return ChatStore(FakeCollection(), FakeCollection(), inline_limit=5, bucket_size=2)
+
+
+def legacy_chat(store, count):
+    """A head written before message_count existed: every message inline."""
+    return store.chats.insert_one({
+        'user_email': 'a@example.com',
+        'title': '0',
+        'messages': [message(i) for i in range(count)],
+        'timestamp': '2024-01-01T00:00:00+00:00',
+    }).inserted_id
+
+
+def texts(head):
+    return [m['text'] for m in head['messages']]
+
+
+def test_legacy_head_over_inline_limit_loads_every_message(store):
+    chat_id = legacy_chat(store, 8)
+    head = store.load(chat_id, 'a@example.com')
+    assert texts(head) == [str(i) for i in range(8)]
+    assert head['message_count'] == 8
+
+
+def test_append_to_large_legacy_head_keeps_earlier_messages(store):
+    chat_id = legacy_chat(store, 8)
+    assert store.append(chat_id, 'a@example.com', 8, [message(8), message(9)]) == 10
+
+    head = store.load(chat_id, 'a@example.com')
+    assert texts(head) == [str(i) for i in range(10)]
+    stored = store.chats.find_one({'_id': chat_id})
+    assert stored['message_count'] == 10
+    assert len(stored['messages']) == 5
+
+
+def test_stale_append_to_large_legacy_head_conflicts(store):
+    chat_id = legacy_chat(store, 8)
+    with pytest.raises(ChatConflict) as excinfo:
+        store.append(chat_id, 'a@example.com', 6, [message(6)])
+    assert excinfo.value.message_count == 8
+    assert texts(store.load(chat_id, 'a@example.com')) == [str(i) for i in range(8)]
+
+
+def test_append_to_small_legacy_head(store):
+    chat_id = legacy_chat(store, 3)
+    store.append(chat_id, 'a@example.com', 3, [message(i) for i in range(3, 7)])
+    assert texts(store.load(chat_id, 'a@example.com')) == [str(i) for i in range(7)]
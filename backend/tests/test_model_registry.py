@@ -0,0 +1,104 @@
+import itertools
+import threading
+import time
+
+from Model.model_registry import ModelRegistry, ModelVersion
+
+
+class FakePool:
+    """Stands in for the worker pool: each build gets its own backend, dropped on close."""
+
+    def __init__(self):
+        self.loaded = set()
+        self.builds = 0
+        self._ids = itertools.count(1)
+
+    def build(self, model_path, encoder_path):
+        self.builds += 1
+        load_id = next(self._ids)
+        self.loaded.add(load_id)
+        pool = self
+
+        class Backend:
+            def shutdown(self):
+                pool.loaded.discard(load_id)
+
+        class Scheduler:
+            def shutdown(self):
+                pass
+
+        backend = Backend()
+        backend.load_id = load_id
+        return ModelVersion(model_path, model_path, encoder_path, None, None, backend, Scheduler())
+
+
+def make_registry(pool, swaps=None):
+    on_swap = swaps.append if swaps is not None else None
+    return ModelRegistry(pool.build, on_swap=on_swap, drain_timeout=1,
+                         fingerprint=lambda model_path, encoder_path: model_path)
+
+
+def wait_for_retired(pool, registry):
+    # Retirement runs on a background thread
+    deadline = time.monotonic() + 2
+    live = {registry.active.backend.load_id}
+    if registry.previous is not None:
+        live.add(registry.previous.backend.load_id)
+    while pool.loaded != live and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_reloading_active_checkpoint_keeps_it_serving():
+    pool = FakePool()
+    registry = make_registry(pool)
+    first = registry.load('a.pth', 'enc')
+    assert registry.load('a.pth', 'enc') is first
+    assert pool.builds == 1
+    assert first.backend.load_id in pool.loaded
+
+
+def test_reloading_previous_checkpoint_swaps_back_without_rebuilding():
+    pool = FakePool()
+    swaps = []
+    registry = make_registry(pool, swaps)
+    a = registry.load('a.pth', 'enc')
+    b = registry.load('b.pth', 'enc')
+    assert registry.load('a.pth', 'enc') is a
+    assert (registry.active, registry.previous) == (a, b)
+    assert pool.builds == 2
+    assert [v.version for v in swaps] == ['a.pth', 'b.pth', 'a.pth']
+    wait_for_retired(pool, registry)
+    assert {a.backend.load_id, b.backend.load_id} <= pool.loaded
+
+
+def test_loading_after_rollback_reuses_loaded_versions():
+    pool = FakePool()
+    registry = make_registry(pool)
+    a = registry.load('a.pth', 'enc')
+    b = registry.load('b.pth', 'enc')
+    registry.rollback()
+    assert registry.load('b.pth', 'enc') is b
+    c = registry.load('c.pth', 'enc')
+    wait_for_retired(pool, registry)
+    assert (registry.active, registry.previous) == (c, b)
+    assert pool.loaded == {b.backend.load_id, c.backend.load_id}
+    assert a.backend.load_id not in pool.loaded
+
+
+def test_concurrent_async_loads_are_refused():
+    pool = FakePool()
+    release = threading.Event()
+
+    def slow_build(model_path, encoder_path):
+        release.wait(2)
+        return pool.build(model_path, encoder_path)
+
+    registry = ModelRegistry(slow_build, fingerprint=lambda model_path, encoder_path: model_path)
+    assert registry.load_async('a.pth', 'enc')
+    assert not registry.load_async('b.pth', 'enc')
+    release.set()
+    deadline = time.monotonic() + 2
+    while registry.active is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.active.version == 'a.pth'
+    assert pool.builds == 1
@@ -0,0 +1,87 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+# --- BACKGROUND THUMBNAIL PIPELINE ---
+THUMBNAIL_SIZES = (64, 128, 256)
+DEFAULT_THUMBNAIL_SIZE = 128
+
+
+def make_thumbnail(image_bytes, size, image_format='WEBP', quality=80):
+    """Returns (bytes, mime type) of an image scaled to fit in size x size."""
+    image = Image.open(io.BytesIO(image_bytes))
+    # JPEG draft mode lets libjpeg decode at 1/2, 1/4 or 1/8 scale directly
+    image.draft('RGB', (size, size))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    image.thumbnail((size, size), Image.LANCZOS)
+
+    out = io.BytesIO()
+    try:
+        image.save(out, format=image_format, quality=quality)
+        mime = f'image/{image_format.lower()}'
+    except (KeyError, OSError):
+        # Pillow built without WebP support
+        out = io.BytesIO()
+        image.save(out, format='JPEG', quality=quality, optimize=True)
+        mime = 'image/jpeg'
+    return out.getvalue(), mime
+
+
+class ThumbnailPipeline:
+    """
+    Builds thumbnails at a few fixed sizes off the request path. Each stored
+    thumbnail goes to the blob store; `on_done` receives the list of
+    {'size', 'blob_id', 'mime'} entries so the caller can attach them to its
+    MongoDB document.
+    """
+
+    def __init__(self, blob_store, sizes=THUMBNAIL_SIZES, image_format='WEBP', workers=2):
+        self.blob_store = blob_store
+        self.sizes = tuple(sorted(sizes))
+        self.image_format = image_format
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+
+    def build(self, image_bytes):
+        thumbnails = []
+        for size in self.sizes:
+            data, mime = make_thumbnail(image_bytes, size, self.image_format)
+            thumbnails.append({
+                'size': size,
+                'blob_id': self.blob_store.put(data, mime),
+                'mime': mime,
+            })
+        return thumbnails
+
+    def schedule(self, image_bytes, on_done):
+        def _run():
+            try:
+                thumbnails = self.build(image_bytes)
+            except Exception:
+                logger.exception("Thumbnail generation failed", extra={'fields': {'image_size': len(image_bytes)}})
+                return
+            try:
+                on_done(thumbnails)
+            except Exception:
+                logger.exception("Could not record thumbnails",
+                                 extra={'fields': {'blob_ids': [t['blob_id'] for t in thumbnails]}})
+
+        return self._executor.submit(_run)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def pick_thumbnail(thumbnails, size=DEFAULT_THUMBNAIL_SIZE):
+    """Smallest stored thumbnail at least `size` pixels, else the largest one."""
+    if not thumbnails:
+        return None
+    ordered = sorted(thumbnails, key=lambda t: t['size'])
+    for thumb in ordered:
+        if thumb['size'] >= size:
+            return thumb
+    return ordered[-1]
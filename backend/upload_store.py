@@ -0,0 +1,193 @@
+import datetime
+import logging
+import os
+import threading
+
+from pymongo import ReturnDocument
+
+from blob_store import LocalBlobStore, blob_id_for, is_valid_blob_id
+
+
+# --- REFERENCE-COUNTED UPLOAD STORAGE ---
+# Uploads live in a LocalBlobStore (<root>/<ab>/<cd>/<sha256>), so identical
+# images are stored once. `upload_refs` holds one document per blob:
+#   {_id: sha256, refcount, length, content_type, created_at, orphaned_at}
+# Every analyses record that points at a blob holds one reference. Blobs whose
+# refcount dropped to zero are deleted by the garbage collector once they have
+# been unreferenced for `grace_seconds`; with `retention_days` set, analyses
+# older than that give up their image reference first, along with their
+# thumbnails. Thumbnails live in the shared `thumbnail_store`, where the same
+# bytes may back other records, so a thumbnail blob is only deleted once none
+# of the `thumbnail_collections` reference it.
+
+logger = logging.getLogger(__name__)
+
+
+class UploadStore:
+    def __init__(self, root, refs, records, retention_days=0, grace_seconds=86400, gc_batch_size=500,
+                 thumbnail_store=None, thumbnail_collections=()):
+        self.blobs = LocalBlobStore(root)
+        self.refs = refs
+        self.records = records
+        self.thumbnail_store = thumbnail_store
+        self.thumbnail_collections = list(thumbnail_collections) or [records]
+        self.retention_days = float(retention_days)
+        self.grace_seconds = float(grace_seconds)
+        self.gc_batch_size = max(1, int(gc_batch_size))
+        self._stop = threading.Event()
+        self._gc_thread = None
+        self._lock = threading.Lock()
+        self.last_gc = None
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.utcnow()
+
+    def path(self, blob_id):
+        return self.blobs._path(blob_id)
+
+    # --- REFERENCES ---
+    def store(self, data, content_type='application/octet-stream'):
+        """Stores the bytes (once per distinct content) and takes a reference; returns the blob id."""
+        blob_id = blob_id_for(data)
+        # Reference first, bytes second: the collector only deletes a blob
+        # after atomically removing a zero refcount, so a blob being stored
+        # is either kept or rewritten here
+        self.refs.update_one(
+            {'_id': blob_id},
+            {
+                '$inc': {'refcount': 1},
+                '$unset': {'orphaned_at': ''},
+                '$setOnInsert': {'length': len(data), 'content_type': content_type, 'created_at': self._now()},
+            },
+            upsert=True
+        )
+        try:
+            self.blobs.put(data, content_type)
+        except Exception:
+            self.release(blob_id)
+            raise
+        return blob_id
+
+    def release(self, blob_id):
+        """Drops one reference; the blob becomes collectable when none are left."""
+        if not is_valid_blob_id(blob_id):
+            return
+        ref = self.refs.find_one_and_update(
+            {'_id': blob_id, 'refcount': {'$gt': 0}},
+            {'$inc': {'refcount': -1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if ref is not None and ref['refcount'] <= 0:
+            self.refs.update_one({'_id': blob_id, 'refcount': 0}, {'$set': {'orphaned_at': self._now()}})
+
+    def get(self, blob_id):
+        return self.blobs.get(blob_id)
+
+    # --- GARBAGE COLLECTION ---
+    def expire_old_records(self):
+        """Applies the retention policy: old analyses drop their image and thumbnails."""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = self._now() - datetime.timedelta(days=self.retention_days)
+        expired = 0
+        old = self.records.find(
+            {
+                'created_at': {'$lt': cutoff},
+                '$or': [{'image_blob_id': {'$exists': True}}, {'thumbnails': {'$exists': True}}],
+            },
+            {'image_blob_id': 1, 'thumbnails': 1}
+        ).limit(self.gc_batch_size)
+        for record in old:
+            blob_id = record.get('image_blob_id')
+            result = self.records.update_one(
+                {'_id': record['_id'], 'image_blob_id': blob_id},
+                {'$unset': {'image_blob_id': '', 'thumbnails': ''}, '$set': {'image_expired_at': self._now()}}
+            )
+            if result.modified_count:
+                if blob_id:
+                    self.release(blob_id)
+                self._delete_unused_thumbnails(record.get('thumbnails') or [])
+                expired += 1
+        return expired
+
+    def _delete_unused_thumbnails(self, thumbnails):
+        if self.thumbnail_store is None:
+            return
+        for thumb in thumbnails:
+            blob_id = thumb.get('blob_id')
+            in_use = any(
+                collection.find_one(
+                    {'$or': [{'thumbnails.blob_id': blob_id}, {'image_blob_id': blob_id}]}, {'_id': 1}
+                )
+                for collection in self.thumbnail_collections
+            )
+            if blob_id and not in_use:
+                self.thumbnail_store.delete(blob_id)
+
+    def _delete_blob(self, blob_id):
+        path = self.path(blob_id)
+        tombstone = f"{path}.{os.getpid()}.gc"
+        try:
+            os.replace(path, tombstone)
+        except FileNotFoundError:
+            tombstone = None
+        # Only delete if nobody took a reference in the meantime
+        if self.refs.delete_one({'_id': blob_id, 'refcount': {'$lte': 0}}).deleted_count:
+            if tombstone:
+                os.remove(tombstone)
+            if not os.path.exists(path):
+                try:
+                    os.remove(path + '.json')
+                except OSError:
+                    pass
+            return True
+        if tombstone:
+            # Same hash, same bytes: restoring over a fresh copy is harmless
+            os.replace(tombstone, path)
+        return False
+
+    def collect(self):
+        """One GC pass; returns counts of expired records and deleted blobs."""
+        started = self._now()
+        expired = self.expire_old_records()
+        cutoff = started - datetime.timedelta(seconds=self.grace_seconds)
+        candidates = self.refs.find(
+            {'refcount': {'$lte': 0}, 'orphaned_at': {'$lt': cutoff}},
+            {'_id': 1}
+        ).limit(self.gc_batch_size)
+        deleted = sum(1 for ref in candidates if self._delete_blob(ref['_id']))
+        summary = {
+            'started_at': started.isoformat(),
+            'expired_records': expired,
+            'deleted_blobs': deleted,
+            'seconds': (self._now() - started).total_seconds(),
+        }
+        with self._lock:
+            self.last_gc = summary
+        return summary
+
+    def start_gc(self, interval_seconds=3600):
+        def _loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    summary = self.collect()
+                    if summary['expired_records'] or summary['deleted_blobs']:
+                        logger.info("Upload GC pass", extra={'fields': summary})
+                except Exception:
+                    logger.exception("Upload GC failed")
+
+        self._gc_thread = threading.Thread(target=_loop, name='upload-gc', daemon=True)
+        self._gc_thread.start()
+
+    def stop_gc(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            last_gc = self.last_gc
+        return {
+            'retention_days': self.retention_days,
+            'grace_seconds': self.grace_seconds,
+            'last_gc': last_gc,
+        }
@@ -0,0 +1,281 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+
+# --- WRITE-BEHIND INSERTS ---
+# Requests hand their record to submit() and reply straight away; a flusher
+# thread inserts queued records with insert_many, in batches closed by size
+# (`max_batch`) or age (`max_delay` seconds). _ids are assigned up front, so
+# callers can return the id immediately and retries are idempotent (a
+# duplicate-key error means the record already landed). Batches that still
+# fail after `max_retries` attempts with exponential backoff are appended to
+# a JSON-lines spill file, which is replayed once MongoDB is reachable again
+# and on the next start. Callbacks can't be spilled, so replayed records go
+# through `on_replayed(collection_name, doc)` instead of their on_flushed.
+# start() launches the flusher; shutdown() drains the queue before the
+# process exits.
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class _Item:
+    __slots__ = ('collection', 'doc', 'on_flushed')
+
+    def __init__(self, collection, doc, on_flushed):
+        self.collection = collection
+        self.doc = doc
+        self.on_flushed = on_flushed
+
+
+class WriteBehindQueue:
+    def __init__(self, db, spill_path, max_batch=100, max_delay=0.2, max_queue=10000,
+                 max_retries=5, backoff_base=0.2, backoff_max=10.0, replay_interval=30.0,
+                 on_replayed=None):
+        self.db = db
+        self.on_replayed = on_replayed
+        self.spill_path = spill_path
+        self.rejected_path = spill_path + '.rejected'
+        self.replay_path = spill_path + '.replaying'
+        self.max_batch = max(1, int(max_batch))
+        self.max_delay = float(max_delay)
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.replay_interval = float(replay_interval)
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._last_replay = 0.0
+        self._running = True
+        self._stop = threading.Event()
+        # How often an idle flusher wakes up to check for shutdown and replays
+        self._poll = min(self.replay_interval, 1.0)
+        self.flushed = 0
+        self.batches = 0
+        self.retries = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.rejected = 0
+        os.makedirs(os.path.dirname(os.path.abspath(spill_path)), exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+
+    def start(self):
+        """Starts the flusher, replaying any spill file first; records submitted before wait in the queue."""
+        self._thread.start()
+
+    # --- PRODUCERS ---
+    def submit(self, collection, doc, on_flushed=None):
+        """
+        Queues `doc` for insertion into `collection` and returns its _id.
+        `on_flushed(_id)` runs on the flusher thread once the record is stored;
+        records that go through the spill file get on_replayed instead.
+        """
+        if not self._running:
+            raise RuntimeError('Write-behind queue has been shut down')
+        doc.setdefault('_id', ObjectId())
+        try:
+            self._queue.put_nowait(_Item(collection.name, doc, on_flushed))
+        except queue.Full:
+            # Still durable, just later: the spill file is replayed by the flusher
+            self._spill([(collection.name, doc)])
+        return doc['_id']
+
+    # --- FLUSHER ---
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=self._poll)
+        except queue.Empty:
+            return []
+        if first is None:
+            return []  # wake-up from shutdown()
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        return batch
+
+    def _run(self):
+        self._replay_spill()
+        # After shutdown() the flusher keeps going until the queue is drained
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+            if not self._stop.is_set() and time.monotonic() - self._last_replay >= self.replay_interval:
+                self._replay_spill()
+
+    def _insert(self, collection_name, docs):
+        """insert_many that treats already-stored _ids as success; returns docs that can never be stored."""
+        try:
+            self.db[collection_name].insert_many(docs, ordered=False)
+            return []
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            return [docs[err['index']] for err in errors if err.get('code') != DUPLICATE_KEY]
+
+    def _flush(self, batch):
+        by_collection = {}
+        for item in batch:
+            by_collection.setdefault(item.collection, []).append(item)
+
+        for collection_name, items in by_collection.items():
+            docs = [item.doc for item in items]
+            if not self._insert_with_retry(collection_name, docs):
+                self._spill([(collection_name, doc) for doc in docs])
+                continue
+            with self._stats_lock:
+                self.flushed += len(docs)
+                self.batches += 1
+            for item in items:
+                if item.on_flushed is not None:
+                    try:
+                        item.on_flushed(item.doc['_id'])
+                    except Exception:
+                        logger.exception("Write-behind callback failed")
+
+    def _insert_with_retry(self, collection_name, docs):
+        delay = self.backoff_base
+        for attempt in range(self.max_retries + 1):
+            try:
+                rejected = self._insert(collection_name, docs)
+                if rejected:
+                    self._reject(collection_name, rejected)
+                return True
+            except PyMongoError as e:
+                # While shutting down, spill after one retry rather than stall exit
+                if attempt == self.max_retries or (not self._running and attempt >= 1):
+                    logger.warning("Write-behind insert failed, spilling %d records: %s", len(docs), e)
+                    return False
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(delay)
+                delay = min(self.backoff_max, delay * 2)
+        return False
+
+    # --- SPILL FILE ---
+    def _append_lines(self, path, records):
+        with open(path, 'a', encoding='utf-8') as f:
+            for collection_name, doc in records:
+                f.write(json_util.dumps({'collection': collection_name, 'doc': doc}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _spill(self, records):
+        with self._spill_lock:
+            self._append_lines(self.spill_path, records)
+        with self._stats_lock:
+            self.spilled += len(records)
+
+    def _reject(self, collection_name, docs):
+        logger.error("Write-behind dropped %d records MongoDB refused; kept in %s", len(docs), self.rejected_path)
+        with self._spill_lock:
+            self._append_lines(self.rejected_path, [(collection_name, doc) for doc in docs])
+        with self._stats_lock:
+            self.rejected += len(docs)
+
+    def _replay_spill(self):
+        """
+        Re-inserts spilled records. The spill file is first renamed aside, so
+        new spills (which may come from request threads) never wait on the
+        inserts; the renamed file is removed once all of its records are
+        stored, and retried as is on the next pass otherwise.
+        """
+        self._last_replay = time.monotonic()
+        with self._spill_lock:
+            if not os.path.exists(self.replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, self.replay_path)
+
+        by_collection = {}
+        with open(self.replay_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # Torn last line from a crash mid-write; the record was never acknowledged durable
+                    continue
+                record = json_util.loads(line)
+                by_collection.setdefault(record['collection'], []).append(record['doc'])
+        try:
+            for collection_name, docs in by_collection.items():
+                for start in range(0, len(docs), self.max_batch):
+                    batch = docs[start:start + self.max_batch]
+                    rejected = self._insert(collection_name, batch)
+                    if rejected:
+                        self._reject(collection_name, rejected)
+                    self._after_replay(collection_name, batch, rejected)
+        except PyMongoError as e:
+            # Partially replayed records are skipped next time as duplicates
+            logger.warning("Write-behind spill replay failed, will retry: %s", e)
+            return
+        os.remove(self.replay_path)
+        replayed = sum(len(docs) for docs in by_collection.values())
+        with self._stats_lock:
+            self.replayed += replayed
+        logger.info("Write-behind replayed spilled records", extra={'fields': {'records': replayed}})
+
+    def _after_replay(self, collection_name, docs, rejected):
+        if self.on_replayed is None:
+            return
+        rejected_ids = {doc['_id'] for doc in rejected}
+        for doc in docs:
+            if doc['_id'] in rejected_ids:
+                continue
+            # A replay retried after a failure may run this twice for a record
+            try:
+                self.on_replayed(collection_name, doc)
+            except Exception:
+                logger.exception("Write-behind replay callback failed")
+
+    # --- LIFECYCLE ---
+    def shutdown(self, timeout=30):
+        """Stops accepting records and flushes (or spills) everything queued."""
+        if not self._running:
+            return
+        self._running = False
+        self._stop.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # the flusher is busy and checks _stop between batches
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                leftovers.append((item.collection, item.doc))
+        if leftovers:
+            self._spill(leftovers)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'flushed': self.flushed,
+                'batches': self.batches,
+                'retries': self.retries,
+                'spilled': self.spilled,
+                'replayed': self.replayed,
+                'rejected': self.rejected,
+                'spill_pending': os.path.exists(self.spill_path) or os.path.exists(self.replay_path),
+            }
@@ -151,6 +151,7 @@ class _ChatHistoryScreenState extends State<ChatHistoryScreen> {
                           MaterialPageRoute(
                             builder: (context) => DiseaseInfoScreen(
                               initialMessages: messages,
+                              chatId: conversation['id'],
                               token: widget.token,
                             ),
                           ),
@@ -36,6 +36,8 @@ class _DiseaseInfoScreenState extends State<DiseaseInfoScreen> {
   String? _error;
   int? _pendingAssistantIndex;
   String? _currentChatId;
+  // How many of _messages the backend already has
+  int _syncedCount = 0;
   bool _conversationChanged = false;
 
   final List<String> _suggestions = const [
@@ -66,11 +68,11 @@ class _DiseaseInfoScreenState extends State<DiseaseInfoScreen> {
           _messages,
           widget.token,
           chatId: _currentChatId,
+          syncedCount: _syncedCount,
         );
+        _syncedCount = response['message_count'] as int? ?? _syncedCount;
         if (_currentChatId == null && response.containsKey('chat_id')) {
-          setState(() {
-            _currentChatId = response['chat_id'];
-          });
+          _currentChatId = response['chat_id'];
         }
         print("Chat history saved/updated successfully.");
       } catch (e) {
@@ -85,6 +87,7 @@ class _DiseaseInfoScreenState extends State<DiseaseInfoScreen> {
     _currentChatId = widget.chatId;
     if (widget.initialMessages != null) {
       _messages = widget.initialMessages!;
+      _syncedCount = _messages.length;
     } else if (widget.initialDisease != null &&
         widget.initialDisease!.isNotEmpty) {
       _fetchInfo(widget.initialDisease);
@@ -2,6 +2,7 @@ import 'dart:convert';
 import 'dart:typed_data';
 import 'package:flutter/material.dart';
 import 'package:provider/provider.dart';
+import '../../config.dart';
 import '../../providers/auth_provider.dart';
 import '../../services/prediction_history_service.dart';
 
@@ -101,6 +102,10 @@ class _HistoryScreenState extends State<HistoryScreen> {
         itemBuilder: (context, index) {
           final item = _items[index];
           final bytes = _decodeImage(item['image_base64']);
+          final imageUrl =
+              (item['thumbnail_url'] ?? item['image_url']) as String?;
+          final token =
+              Provider.of<AuthProvider>(context, listen: false).token ?? '';
           final prediction = item['prediction']?.toString() ?? 'Unknown';
           final confidence = item['confidence'];
           final createdAt = item['created_at']?.toString() ?? '';
@@ -126,6 +131,14 @@ class _HistoryScreenState extends State<HistoryScreen> {
                             height: 80,
                             fit: BoxFit.cover,
                           )
+                        : imageUrl != null
+                        ? Image.network(
+                            '$backendUrl$imageUrl',
+                            headers: {'Authorization': 'Bearer $token'},
+                            width: 80,
+                            height: 80,
+                            fit: BoxFit.cover,
+                          )
                         : Container(
                             width: 80,
                             height: 80,
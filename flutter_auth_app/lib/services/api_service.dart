@@ -67,12 +67,17 @@ class ApiService {
     }
   }
 
+  /// Sends chat messages to the backend. With [baseSeq], [messages] holds only
+  /// the messages after the first [baseSeq] ones and the server appends them;
+  /// a 409 response carries the server's `message_count` so the caller can
+  /// resend from there.
   Future<Map<String, dynamic>> saveOrUpdateChatHistory(
       List<Map<String, dynamic>> messages, String token,
-      {String? chatId}) async {
+      {String? chatId, int? baseSeq}) async {
     final body = {
       'messages': messages,
       if (chatId != null) 'chat_id': chatId,
+      if (baseSeq != null) 'base_seq': baseSeq,
     };
 
     final response = await http.post(
@@ -84,8 +89,13 @@ class ApiService {
       body: json.encode(body),
     );
 
-    if (response.statusCode == 200 || response.statusCode == 201) {
-      return json.decode(response.body);
+    if (response.statusCode == 200 ||
+        response.statusCode == 201 ||
+        response.statusCode == 409) {
+      return {
+        ...json.decode(response.body) as Map<String, dynamic>,
+        'conflict': response.statusCode == 409,
+      };
     } else {
       throw Exception('Failed to save or update chat history');
     }
@@ -23,25 +23,51 @@ class ChatHistoryService {
 
 
 
-  /// Saves a full conversation thread to the backend.
+  /// Saves a conversation thread to the backend.
   ///
-  /// The [messages] list contains the chat messages to be saved.
+  /// The [messages] list contains the whole conversation.
   /// The [token] is the user's authentication JWT.
-  /// The optional [chatId] is used to update an existing conversation.
+  /// The optional [chatId] is used to update an existing conversation, and
+  /// [syncedCount] is how many of [messages] the server already has; only the
+  /// messages after it are sent.
+  /// The returned map contains `chat_id` and the server's `message_count`.
   Future<Map<String, dynamic>> saveConversation(
       List<ChatMessage> messages, String token,
-      {String? chatId}) async {
+      {String? chatId, int syncedCount = 0}) async {
     // A guard clause to prevent sending empty or null data to the backend.
     if (messages.isEmpty) {
       return {};
     }
 
-    // Convert the list of ChatMessage objects into a list of Maps (JSON format)
-    // that can be sent in the request body.
-    final messagesJson = messages.map((msg) => msg.toJson()).toList();
+    // New conversations are sent whole.
+    if (chatId == null) {
+      final messagesJson = messages.map((msg) => msg.toJson()).toList();
+      return await _apiService.saveOrUpdateChatHistory(messagesJson, token);
+    }
 
-    // Call the ApiService to perform the network request.
+    var baseSeq = syncedCount;
+    // One retry: on a conflict the server reports how many messages it has.
+    for (var attempt = 0; attempt < 2; attempt++) {
+      if (baseSeq >= messages.length) {
+        return {'chat_id': chatId, 'message_count': baseSeq};
+      }
+      final delta =
+          messages.sublist(baseSeq).map((msg) => msg.toJson()).toList();
+      final response = await _apiService.saveOrUpdateChatHistory(delta, token,
+          chatId: chatId, baseSeq: baseSeq);
+      if (response['conflict'] != true) {
+        return response;
+      }
+      final serverCount = response['message_count'] as int;
+      if (serverCount > messages.length) {
+        break;
+      }
+      baseSeq = serverCount;
+    }
+
+    // Our copy diverged from the server's; rewrite the conversation.
+    final messagesJson = messages.map((msg) => msg.toJson()).toList();
     return await _apiService.saveOrUpdateChatHistory(messagesJson, token,
         chatId: chatId);
   }
-}
\ No newline at end of file
+}